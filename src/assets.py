@@ -1,29 +1,132 @@
-import pygame
+import math
+from collections import OrderedDict
 from pathlib import Path
 from config import Config
 
 class AssetManager:
+    """
+    Singleton cache of the sprites in Config.Assets_Folder, each decoded on its first get_asset.
+    Set HEADLESS before first use to skip loading, every asset is then None
+    and pygame is never imported.
+    """
     _instance = None
     ASSET_CACHE = {}
+    ASSET_NAMES = {}
+    HEADLESS = False
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(AssetManager, cls).__new__(cls)
-            cls._instance._initialized = False
         return cls._instance
 
-    def __init__(self):
-        if not self._initialized:
-            self._initialized = True
-            self.load_all()
-
     def load_all(self):
-        asset_folder = Path(Config.Assets_Folder)
+        """
+        Decode every asset now instead of on first use
+        """
+        for asset_file in Path(Config.Assets_Folder).glob('*.png'):
+            self.get_asset(asset_file.stem)
+
+    def get_asset(self, asset_name):
+        if AssetManager.HEADLESS or asset_name is None:
+            return None
 
-        for asset_file in asset_folder.glob('*.png'):
-            asset_name = asset_file.stem
-            image = pygame.image.load(str(asset_file)).convert_alpha()
+        if asset_name not in self.ASSET_CACHE:
+            asset_file = Path(Config.Assets_Folder) / f"{asset_name}.png"
+            image = None
+            if asset_file.exists():
+                import pygame
+                image = pygame.image.load(str(asset_file)).convert_alpha()
+                self.ASSET_NAMES[image] = asset_name
             self.ASSET_CACHE[asset_name] = image
+        return self.ASSET_CACHE[asset_name]
 
-    def get_asset(self, asset_name):
-        return self.ASSET_CACHE.get(asset_name)
+    def name_of(self, asset):
+        """
+        Name an asset surface was loaded under, None for surfaces made elsewhere
+        """
+        return self.ASSET_NAMES.get(asset)
+
+
+class SpriteCache:
+    """
+    Pre-scaled sprites keyed by (asset name, quantized pixel size), least recently used first out.
+
+    max_bytes | Pixel memory the cache may hold, sprites larger than this are never stored
+    step      | Sizes above 16 px are rounded to powers of step, so a slow zoom reuses sprites
+    mipmaps   | Downscale from a smoothscaled half size chain instead of the full image
+    """
+    EXACT_SIZE = 16
+
+    def __init__(self, max_bytes=Config.Sprite_Cache_Bytes, step=1.04, mipmaps=False):
+        self.max_bytes = max_bytes
+        self.step = step
+        self.mipmaps = mipmaps
+        self.sprites = OrderedDict()
+        self.chains = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def quantize(self, size: int):
+        if size <= SpriteCache.EXACT_SIZE:
+            return size
+        return int(round(self.step ** round(math.log(size, self.step))))
+
+    def get(self, name, asset, size: int):
+        """
+        asset scaled to a size x size square, name keys the cache (None uses the surface itself)
+        """
+        import pygame
+
+        size = self.quantize(max(size, 0))
+        key = (name if name is not None else asset, size)
+
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        sprite = pygame.transform.scale(self.source(key[0], asset, size), (size, size))
+        sprite_bytes = size * size * sprite.get_bytesize()
+        if sprite_bytes > self.max_bytes:
+            return sprite
+
+        self.sprites[key] = sprite
+        self.bytes += sprite_bytes
+        while self.bytes > self.max_bytes:
+            _, evicted = self.sprites.popitem(last=False)
+            self.bytes -= evicted.get_width() * evicted.get_height() * evicted.get_bytesize()
+        return sprite
+
+    def source(self, key, asset, size: int):
+        """
+        Smallest mipmap level still at least size pixels wide, or the asset itself
+        """
+        if not self.mipmaps:
+            return asset
+
+        import pygame
+
+        if key not in self.chains:
+            chain = [asset]
+            while min(chain[-1].get_size()) > 1:
+                width, height = chain[-1].get_size()
+                chain.append(pygame.transform.smoothscale(chain[-1], (max(1, width // 2), max(1, height // 2))))
+            self.chains[key] = chain
+
+        for level in reversed(self.chains[key]):
+            if level.get_width() >= size:
+                return level
+        return asset
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "sprites": len(self.sprites),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
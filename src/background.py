@@ -0,0 +1,51 @@
+"""
+Tiled star background, composited once per window size
+"""
+
+import math
+import pygame
+
+
+class Background:
+    """
+    tile | Image repeated across the window
+
+    The tiles are blitted once into a surface one tile larger than the window,
+    each frame is then a single blit of that surface at the parallax offset.
+    """
+    def __init__(self, tile: pygame.Surface):
+        self.tile = tile
+        self.surface = None
+        self.window_size = None
+        self.last_offset = None
+
+    def resize(self, window_size):
+        tile_width, tile_height = self.tile.get_size()
+        window_width, window_height = window_size
+        x_tiles = -(-window_width // tile_width) + 1
+        y_tiles = -(-window_height // tile_height) + 1
+
+        self.surface = pygame.Surface((x_tiles * tile_width, y_tiles * tile_height)).convert()
+        for x in range(x_tiles):
+            for y in range(y_tiles):
+                self.surface.blit(self.tile, (x * tile_width, y * tile_height))
+        self.window_size = window_size
+        self.last_offset = None
+
+    def draw(self, window: pygame.Surface, offset_x: float, offset_y: float, dirty=None):
+        """
+        Cover the window with the background scrolled by (offset_x, offset_y) pixels.
+        When dirty rects are given and the offset has not changed since the last call,
+        only those rects are restored instead of the whole window.
+        """
+        if window.get_size() != self.window_size:
+            self.resize(window.get_size())
+
+        # Rounded up, the per tile blits this replaces all but the first landed on the ceiling
+        tile_width, tile_height = self.tile.get_size()
+        offset = (math.ceil(offset_x % tile_width) % tile_width, math.ceil(offset_y % tile_height) % tile_height)
+        if dirty is not None and offset == self.last_offset:
+            window.blits([(self.surface, rect, rect.move(offset)) for rect in dirty], doreturn=False)
+        else:
+            window.blit(self.surface, (-offset[0], -offset[1]))
+        self.last_offset = offset
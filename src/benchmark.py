@@ -0,0 +1,781 @@
+"""
+Physics benchmarks, run from the src folder
+
+    python benchmark.py accuracy --n 2000 --max-error 0.02
+    python benchmark.py tiled --n 1 100 1000 3000 --workers 1 2 4
+    python benchmark.py scaling --n 8000 --workers 1 2 4 8
+    python benchmark.py integrators --target 1e-6
+    python benchmark.py timesteps --days 91 --max-error 0.01
+    python benchmark.py vector
+    python benchmark.py startup --presets 3 100 300 --assets
+    python benchmark.py suite --save baseline.json
+    python benchmark.py suite --baseline baseline.json --tolerance 0.1 --repeat 5
+    python benchmark.py precision --n 2000 --steps 100
+    python benchmark.py ensemble --members 1 10 100 1000
+    python benchmark.py particles --particles 1000 10000 100000
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+import numpy as np
+from assets import AssetManager
+from planet import Planet
+from vector import Vector2D
+from physics import PhysicsEngine, allocate_tile, direct_sum_rows
+from integrators import INTEGRATORS
+from config import Config
+from presets import Preset
+from generators import plummer
+from ensemble import EnsembleEngine
+
+
+def random_disk(n: int, seed=0):
+    """
+    Flat disk of n equal mass asteroids on roughly circular orbits around a central star
+    """
+    rng = np.random.default_rng(seed)
+    star_mass = 1.989 * 10**30
+    radii = rng.uniform(1.0, 5.0, n - 1) * 1.496 * 10**11
+    angles = rng.uniform(0.0, 2 * np.pi, n - 1)
+    speeds = np.sqrt(6.6743015 * 10**-11 * star_mass / radii)
+
+    objects = [
+        Planet("Star", None, star_mass, 6.957 * 10**8, 1, (252, 186, 3), Vector2D(0.0, 0.0), Vector2D(0.0, 0.0))
+    ]
+    for i in range(n - 1):
+        c, s = np.cos(angles[i]), np.sin(angles[i])
+        objects.append(Planet(
+            f"Asteroid {i}", None, 10**20, 10**5, 1, (180, 180, 180),
+            Vector2D(radii[i] * c, radii[i] * s),
+            Vector2D(-speeds[i] * s, speeds[i] * c)
+        ))
+    return objects
+
+
+def earth_moon():
+    """
+    Same bodies as the "Earth & Moon" preset, without sprites
+    """
+    return [
+        Planet("Earth", None, 5.9724 * 10**24, 6.356 * 10**6, 5, (11, 227, 195),
+               Vector2D(5 * 10**8, 5 * 10**8), Vector2D(0, 0)),
+        Planet("Moon", None, 7.34767309e22, 1.7371e6, 3, (180, 180, 180),
+               Vector2D(8.992 * 10**8, 5 * 10**8), Vector2D(0, 1022)),
+    ]
+
+
+def accuracy_systems(n: int, seed: int):
+    """
+    (label, store) pairs for the accuracy benchmark. Around a star the exact star term hides the
+    tree's error, the equal mass cluster is where every force comes from the tree's approximations.
+    """
+    parsec = 3.0857 * 10**16
+    return [
+        ("disk", Preset("disk", random_disk(n, seed), 1.0, 3600.0).store),
+        ("cluster", plummer(n, 1000 * 1.989 * 10**30, parsec, seed=seed)),
+    ]
+
+
+def accuracy(args):
+    failures = []
+    for system, store in accuracy_systems(args.n, args.seed):
+        reference = PhysicsEngine(store)
+        start = time.perf_counter()
+        exact = reference.compute_accelerations().copy()
+        direct_time = time.perf_counter() - start
+        exact_norm = np.linalg.norm(exact, axis=1)
+
+        print(f"{system}, N={args.n}  direct: {direct_time * 1000:.1f} ms")
+
+        candidates = [
+            (f"tiled {args.tile}", PhysicsEngine(store, backend="tiled", tile_size=args.tile))
+        ] + [
+            (f"barnes_hut theta={theta}", PhysicsEngine(store, backend="barnes_hut", theta=theta))
+            for theta in args.theta
+        ]
+        for label, engine in candidates:
+            start = time.perf_counter()
+            approx = engine.compute_accelerations()
+            elapsed = time.perf_counter() - start
+
+            error = np.linalg.norm(approx - exact, axis=1) / exact_norm
+            median, p99 = np.median(error), np.percentile(error, 99)
+            print(
+                f"{label:<24} {elapsed * 1000:8.1f} ms  "
+                f"relative error median={median:.2e} p99={p99:.2e} max={error.max():.2e}"
+            )
+            # Larger openings trade accuracy for speed on purpose, only theta up to --check-theta must pass
+            checked = engine.backend == "barnes_hut" and engine.theta <= args.check_theta
+            if checked and (median >= args.max_error or p99 >= args.max_p99):
+                failures.append(f"{system} {label}")
+
+    if failures:
+        print(
+            f"Median relative error of {args.max_error:g} or p99 of {args.max_p99:g} or more: " + ", ".join(failures)
+        )
+        sys.exit(1)
+
+
+def tiled(args):
+    failures = []
+    for n in args.n:
+        objects = random_disk(n, args.seed)
+        exact = PhysicsEngine(objects).compute_accelerations().copy()
+        for workers in args.workers:
+            for tile in args.tile:
+                engine = PhysicsEngine(objects, backend="tiled", tile_size=tile, workers=workers)
+                approx = engine.compute_accelerations()
+                # Same pairs in the same order as the direct sum, only round off may differ
+                matches = np.allclose(approx, exact, rtol=args.rtol, atol=0.0)
+                error = np.abs(approx - exact).max() / max(np.abs(exact).max(), np.finfo(float).tiny)
+                print(f"N={n:<6} workers={workers:<3} tile={tile:<5} max error {error:.2e}  {'ok' if matches else 'MISMATCH'}")
+                if not matches:
+                    failures.append(f"N={n} workers={workers} tile={tile}")
+
+    if failures:
+        print(f"Tiled differs from direct beyond rtol={args.rtol:g}: " + ", ".join(failures))
+        sys.exit(1)
+
+
+def steps_per_second(engine: PhysicsEngine, dt: float, steps: int):
+    engine.step_n(1, dt)  # warm up
+    start = time.perf_counter()
+    engine.step_n(steps, dt)
+    return steps / (time.perf_counter() - start)
+
+
+def scaling(args):
+    objects = random_disk(args.n, args.seed)
+    print(f"N={args.n}  tiled backend, {os.cpu_count()} cores available")
+
+    baseline = None
+    for workers in args.workers:
+        engine = PhysicsEngine(objects, backend="tiled", workers=workers)
+        rate = steps_per_second(engine, args.dt, args.steps)
+        baseline = baseline or rate
+        print(f"workers={workers:<3} {rate:8.2f} steps/s  speedup {rate / baseline:.2f}x")
+
+
+def energy_error(integrator: str, dt: float, span: float, samples=64):
+    """
+    Run earth_moon for span seconds, returns (max relative energy error, integration wall time)
+    """
+    engine = PhysicsEngine(earth_moon(), integrator=integrator)
+    initial = engine.energy()
+    steps = int(round(span / dt))
+    chunk = max(1, steps // samples)
+
+    worst = 0.0
+    elapsed = 0.0
+    done = 0
+    while done < steps:
+        n = min(chunk, steps - done)
+        start = time.perf_counter()
+        engine.step_n(n, dt)
+        elapsed += time.perf_counter() - start
+        done += n
+        worst = max(worst, abs((engine.energy() - initial) / initial))
+    return worst, elapsed
+
+
+def integrators(args):
+    period = 27.3 * 86400
+    span = args.orbits * period
+    print(f"Earth & Moon, {args.orbits} orbits, target relative energy error {args.target:.0e}")
+
+    for name in args.schemes:
+        dt = span / 16
+        while span / dt <= args.max_steps:
+            error, elapsed = energy_error(name, dt, span)
+            if error <= args.target:
+                print(
+                    f"{name:<9} dt={dt:10.1f} s  steps={int(round(span / dt)):>8}  "
+                    f"error={error:.1e}  wall={elapsed * 1000:9.1f} ms"
+                )
+                break
+            dt *= 0.5
+        else:
+            print(f"{name:<9} target not reached within {args.max_steps} steps")
+
+
+def timesteps(args):
+    """
+    Moon around the Earth around the Sun, the timestep modes against a fine fixed step reference
+    """
+    from presets import get_presets
+    preset = next(entry for entry in get_presets() if entry.name == "Solar System").build()
+    names = [planet.name for planet in preset.store.planets]
+    earth, moon = names.index("Earth"), names.index("Moon")
+    span = args.days * 86400
+
+    def run(timestep: str, dt: float):
+        engine = PhysicsEngine(preset.store.copy(), integrator="leapfrog", dt=dt, timestep=timestep)
+        start = time.perf_counter()
+        engine.advance(span)
+        return engine, time.perf_counter() - start
+
+    reference, _ = run("fixed", args.reference_dt)
+    separation = reference.positions[moon] - reference.positions[earth]
+    print(f"Solar System, {args.days} days, reference fixed dt={args.reference_dt:g} s")
+
+    failures = []
+    for timestep, dt in (("fixed", args.dt / 8), ("adaptive", args.dt), ("hierarchical", args.dt)):
+        engine, elapsed = run(timestep, dt)
+        error = np.linalg.norm(engine.positions[moon] - engine.positions[earth] - separation) / np.linalg.norm(separation)
+        print(f"{timestep:<13} dt={dt:8.0f} s  steps={engine.steps:>6}  Earth-Moon error={error:.2e}  wall={elapsed * 1000:8.1f} ms")
+        if timestep in args.check and error > args.max_error:
+            failures.append(timestep)
+
+    if failures:
+        print(f"Earth-Moon separation off by more than {args.max_error:g}: " + ", ".join(failures))
+        sys.exit(1)
+
+
+class ArrayVector2D:
+    """
+    The previous ndarray backed Vector2D, kept as the baseline for the vector benchmark
+    """
+    def __init__(self, x=0.0, y=0.0):
+        self.vector = np.array([x, y], dtype=np.float64)
+
+    @property
+    def x(self):
+        return self.vector[0]
+
+    @property
+    def y(self):
+        return self.vector[1]
+
+    @property
+    def magnitude(self):
+        return np.linalg.norm(self.vector)
+
+    def __add__(self, other):
+        return ArrayVector2D(*(self.vector + other.vector))
+
+    def __sub__(self, other):
+        return ArrayVector2D(*(self.vector - other.vector))
+
+    def __mul__(self, scalar):
+        return ArrayVector2D(*(self.vector * scalar))
+
+
+def vector(args):
+    cases = {
+        "a + b": "a + b",
+        "a * 0.5": "a * 0.5",
+        "a += b": "a += b",
+        "magnitude": "a.magnitude",
+        "screen transform": "(a - b) * (1 / 1e6)",
+    }
+    print(f"{'operation':<18}{'ndarray':>12}{'slots':>12}{'speedup':>10}")
+    for label, statement in cases.items():
+        timings = []
+        for cls in (ArrayVector2D, Vector2D):
+            timings.append(min(timeit.repeat(
+                statement, setup="a = cls(3.0, 4.0); b = cls(1.0, 2.0)",
+                globals={"cls": cls}, number=args.number, repeat=5
+            )))
+        old, new = (t / args.number * 1e9 for t in timings)
+        print(f"{label:<18}{old:>10.0f}ns{new:>10.0f}ns{old / new:>9.1f}x")
+
+
+def best_time(function, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def startup(args):
+    if args.assets:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        import pygame
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+
+        def decode(load):
+            AssetManager.ASSET_CACHE.clear()
+            AssetManager.ASSET_NAMES.clear()
+            load()
+
+        eager = best_time(lambda: decode(AssetManager().load_all), args.repeat)
+        lazy = best_time(lambda: decode(lambda: AssetManager().get_asset("stars")), args.repeat)
+        print(f"assets: every sprite {eager * 1e3:.1f}ms, background only {lazy * 1e3:.1f}ms")
+        pygame.display.quit()
+
+    # Sprites are measured above, presets are timed on construction alone
+    AssetManager.HEADLESS = True
+    from presets import LazyPreset, get_presets
+    library = get_presets()
+
+    print(f"{'presets':>8}{'eager':>12}{'lazy':>12}{'speedup':>10}")
+    for size in args.presets:
+        entries = [library[i % len(library)] for i in range(size)]
+        eager = best_time(lambda: [entry.build() for entry in entries], args.repeat)
+        lazy = best_time(lambda: [LazyPreset(entry.name, entry.build) for entry in entries], args.repeat)
+        print(f"{size:>8}{eager * 1e3:>10.2f}ms{lazy * 1e3:>10.3f}ms{eager / lazy:>9.0f}x")
+
+
+def suite_backend(n: int):
+    """
+    Backend a preset of n bodies would pick, the direct sum's N x N buffers stop fitting past a few thousand
+    """
+    if n <= 1000:
+        return "direct"
+    if n <= 5000:
+        return "tiled"
+    return "barnes_hut"
+
+
+def synthetic_preset(n: int, seed: int, backend=None):
+    """
+    random_disk of n bodies as a Preset, built through Planet and Vector2D like the real presets
+    """
+    return Preset(f"Disk {n}", random_disk(n, seed), space_scale=2 * 10**9, dt=3600, backend=backend or suite_backend(n))
+
+
+def measure_steps(preset, budget: float, min_steps=3):
+    """
+    Engine steps per second, steps are taken until budget seconds have passed
+    """
+    engine = PhysicsEngine.from_preset(preset)
+    engine.step_n(1, preset.dt)  # warm up
+    steps = 0
+    start = time.perf_counter()
+    while steps < min_steps or time.perf_counter() - start < budget:
+        engine.step_n(1, preset.dt)
+        steps += 1
+    return steps / (time.perf_counter() - start)
+
+
+def measure_memory(preset):
+    """
+    Peak bytes allocated while building an engine for the preset and taking one step
+    """
+    tracemalloc.start()
+    try:
+        engine = PhysicsEngine.from_preset(preset)
+        engine.step_n(1, preset.dt)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_render(preset, frames: int):
+    """
+    Mean seconds per frame of the window's render path (trails and bodies) on an offscreen surface,
+    the positions of every frame are simulated up front and the trails start full length
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    import pygame.freetype
+    from renderer import Renderer
+    from trails import TrailBuffer
+    pygame.freetype.init()
+
+    engine = PhysicsEngine.from_preset(preset)
+    start_positions, start_velocities = engine.positions.copy(), engine.velocities.copy()
+    history = []
+    for _ in range(frames):
+        engine.step_n(1, preset.dt)
+        history.append(engine.positions.copy())
+
+    window = pygame.Surface(Config.Window)
+    renderer = Renderer(pygame.freetype.Font(Config.Font_Path, Config.Font_Size))
+    trails = TrailBuffer.for_store(preset.store, Config.Max_Trails)
+    # Disk centered on the window
+    camera = Vector2D(-Config.Window[0] / 2 * preset.space_scale, -Config.Window[1] / 2 * preset.space_scale)
+    # Straight line trails back along the starting velocities, as long as the window keeps them
+    for back in range(trails.max_points, 0, -1):
+        trails.push(start_positions - back * preset.dt * start_velocities)
+
+    start = time.perf_counter()
+    for positions in history:
+        window.fill((0, 0, 0))
+        trails.push(positions)
+        trails.draw(window, preset.store.colors, preset.space_scale, camera)
+        visible = renderer.draw(window, preset.store, positions, preset.space_scale, camera)
+        trails.clear(~visible)
+    return (time.perf_counter() - start) / frames
+
+
+def measure_case(n: int, args):
+    """
+    One sample of every suite metric for n bodies, the stepping budget is shared by the repeats
+    """
+    # Collections triggered by earlier cases land in the build at random, as timeit the collector is off
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        preset = synthetic_preset(n, args.seed, args.backend)
+        build = time.perf_counter() - start
+    finally:
+        gc.enable()
+
+    return {
+        "backend": preset.backend,
+        "build_ms": build * 1000,
+        "steps_per_second": measure_steps(preset, args.budget / args.repeat),
+        "peak_memory_mb": measure_memory(preset) / 2**20,
+        "render_ms": measure_render(preset, args.frames) * 1000,
+    }
+
+
+def run_suite(args):
+    """
+    Median of args.repeat samples of every metric, for every size, with their quartiles
+    """
+    results = {}
+    # First use costs of numpy and the preset modules stay out of the smallest case
+    synthetic_preset(2, args.seed)
+    for n in args.n:
+        samples = [measure_case(n, args) for _ in range(args.repeat)]
+        case = {"backend": samples[0]["backend"], "quartiles": {}}
+        for metric, *_ in SUITE_METRICS:
+            values = [sample[metric] for sample in samples]
+            case[metric] = float(np.median(values))
+            case["quartiles"][metric] = [float(value) for value in np.percentile(values, [25, 75])]
+        results[f"n={n}"] = case
+        print(
+            f"n={n:<7} {case['backend']:<11} build {case['build_ms']:9.1f} ms  "
+            f"{case['steps_per_second']:10.2f} steps/s  {case['peak_memory_mb']:9.1f} MB peak  "
+            f"render {case['render_ms']:8.2f} ms/frame"
+        )
+    return results
+
+
+# Metric, whether larger is better, unit of its absolute floor
+SUITE_METRICS = (
+    ("build_ms", False, "ms"),
+    ("steps_per_second", True, "ms"),
+    ("peak_memory_mb", False, "MB"),
+    ("render_ms", False, "ms"),
+)
+
+
+def cost(metric: str, value: float):
+    """
+    Milliseconds or megabytes spent, steps per second become milliseconds per step
+    """
+    if metric == "steps_per_second":
+        return 1000 / value if value else np.inf
+    return value
+
+
+def machine():
+    import pygame
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def spread(metric: str, case: dict):
+    """
+    Interquartile range of the samples behind case[metric] relative to their median, in cost,
+    0 for results saved without quartiles
+    """
+    low, high = case.get("quartiles", {}).get(metric, (case[metric], case[metric]))
+    median = cost(metric, case[metric])
+    return abs(cost(metric, high) - cost(metric, low)) / median if median else 0.0
+
+
+def compare(baseline: dict, results: dict, tolerance: float, floors: dict):
+    """
+    Print every metric against the baseline, returns the regressions worse than tolerance.
+    The tolerance of every metric is widened by the larger spread of its samples in the two runs,
+    the noise the machine showed, and floors maps a unit to the smallest absolute change reported.
+    """
+    print(f"\n{'case':<10}{'metric':<18}{'baseline':>12}{'current':>12}{'change':>9}")
+    regressions = []
+    for case, metrics in results.items():
+        if case not in baseline:
+            print(f"{case:<10}not in the baseline")
+            continue
+        for metric, larger_is_better, unit in SUITE_METRICS:
+            old, new = baseline[case][metric], metrics[metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if larger_is_better else change
+            significant = abs(cost(metric, new) - cost(metric, old)) > floors[unit]
+            margin = tolerance + max(spread(metric, baseline[case]), spread(metric, metrics))
+            flag = ""
+            if worse > margin and significant:
+                flag = "  REGRESSION"
+                regressions.append(f"{case} {metric} {change:+.1%}")
+            elif worse < -margin and significant:
+                flag = "  faster" if metric != "peak_memory_mb" else "  smaller"
+            print(f"{case:<10}{metric:<18}{old:>12.2f}{new:>12.2f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def suite(args):
+    results = run_suite(args)
+    report = {"machine": machine(), "seed": args.seed, "repeat": args.repeat, "results": results}
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline["machine"] != report["machine"]:
+            print("Baseline was recorded on another machine or library versions, compare with care")
+        floors = {"ms": args.floor_ms, "MB": args.floor_mb}
+        regressions = compare(baseline["results"], results, args.tolerance, floors)
+        if regressions:
+            print(
+                f"\n{len(regressions)} regressions beyond {args.tolerance:.0%} and the spread of the repeats: "
+                + ", ".join(regressions)
+            )
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} and the spread of the repeats")
+
+
+def precision_systems(n: int, seed: int):
+    """
+    (label, store) pairs for the precision benchmark, a disk around a star and a star cluster
+    far from the origin, where absolute float32 coordinates lose the most
+    """
+    parsec = 3.0857 * 10**16
+    return [
+        ("disk", Preset("disk", random_disk(n, seed), 1.0, 3600.0).store),
+        ("offset cluster", plummer(
+            n, 1000 * 1.989 * 10**30, parsec, center=(100 * parsec, 40 * parsec), softening=0.1 * parsec, seed=seed
+        )),
+    ]
+
+
+def naive_float32(engine: PhysicsEngine):
+    """
+    Accelerations from float32 copies of the absolute positions and masses, without re-centering
+    """
+    out = np.zeros((engine.N, 2))
+    softenings = engine.softenings
+    if softenings is not None:
+        softenings = np.asarray(softenings, dtype=np.float32)
+    direct_sum_rows(
+        engine.positions.astype(np.float32), engine.masses.astype(np.float32), out, 0, engine.N,
+        allocate_tile(engine.N, engine.N, np.float32), softenings, engine.softening_kernel
+    )
+    return out
+
+
+def energy_drift(store, precision: str, dt: float, steps: int):
+    engine = PhysicsEngine(store.copy(), integrator="leapfrog", precision=precision)
+    initial = engine.energy()
+    engine.step_n(steps, dt)
+    return abs((engine.energy() - initial) / initial)
+
+
+def precision(args):
+    for label, store in precision_systems(args.n, args.seed):
+        reference = PhysicsEngine(store.copy())
+        exact = reference.compute_accelerations().copy()
+        exact_norm = np.linalg.norm(exact, axis=1)
+        # One dynamical time of the system split into steps
+        radius = np.sqrt(np.mean(np.sum((store.positions - store.positions.mean(axis=0)) ** 2, axis=1)))
+        dt = np.sqrt(radius**3 / (6.6743015 * 10**-11 * store.masses.sum())) / args.steps
+
+        print(f"{label}, N={args.n}")
+        candidates = [
+            ("float64", reference.compute_accelerations),
+            ("float32", PhysicsEngine(store.copy(), precision="float32").compute_accelerations),
+            ("float32 absolute", lambda: naive_float32(reference)),
+        ]
+        for name, evaluate in candidates:
+            evaluate()  # warm up
+            elapsed = best_time(evaluate, args.repeat)
+            with np.errstate(invalid="ignore"):
+                error = np.linalg.norm(evaluate() - exact, axis=1) / exact_norm
+            line = (
+                f"  {name:<17} {elapsed * 1000:8.1f} ms  relative error "
+                f"median={np.median(error):.2e} p99={np.percentile(error, 99):.2e} max={error.max():.2e}"
+            )
+            if name != "float32 absolute":
+                line += f"  energy drift after {args.steps} steps {energy_drift(store, name, dt, args.steps):.2e}"
+            print(line)
+
+
+def ensemble(args):
+    presets = [
+        ("Earth & Moon", Preset("Earth & Moon", earth_moon(), 1.0, 100.0)),
+        (f"disk N={args.n}", Preset("disk", random_disk(args.n, args.seed), 1.0, 3600.0)),
+    ]
+    for label, preset in presets:
+        print(f"{label}, {args.steps} leapfrog steps, member steps/sec")
+        for members in args.members:
+            engine = EnsembleEngine(
+                np.broadcast_to(preset.store.positions, (members, len(preset.store), 2)),
+                np.broadcast_to(preset.store.velocities, (members, len(preset.store), 2)),
+                preset.store.masses
+            )
+            vectorized = members * steps_per_second(engine, preset.dt, args.steps)
+
+            # The same members as separate engines, each stepped by its own Python loop
+            engines = [PhysicsEngine(preset.store.copy(), integrator="leapfrog") for _ in range(members)]
+            start = time.perf_counter()
+            for single in engines:
+                single.step_n(args.steps, preset.dt)
+            looped = members * args.steps / (time.perf_counter() - start)
+            print(f"  M={members:<6} ensemble {vectorized:12.0f}  engines {looped:12.0f}  speedup {vectorized / looped:6.1f}x")
+
+
+def particles(args):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from renderer import Renderer
+    from bodies import BodyStore
+    from generators import keplerian_disk
+    from particles import TestParticles
+
+    earth, moon = earth_moon()
+    dt = 100.0
+    space_scale = 10**6
+    window = pygame.Surface(Config.Window)
+    camera = Vector2D(earth.position.x - Config.Window[0] / 2 * space_scale, earth.position.y - Config.Window[1] / 2 * space_scale)
+    print("Earth & Moon with P debris particles, steps/sec and render ms/frame")
+    for count in args.particles:
+        disk = keplerian_disk(count, earth.mass, 2e7, 3e8, body_mass=1.0, center=earth.position.Args, seed=args.seed)
+        cloud = TestParticles.from_store(disk)
+        tier = steps_per_second(
+            PhysicsEngine(earth_moon(), integrator="leapfrog", particles=cloud), dt, args.steps
+        )
+        line = f"  P={count:<7} test particles {tier:10.1f} steps/s"
+
+        if count <= args.max_bodies:
+            store = BodyStore.concatenate([BodyStore.from_planets(earth_moon()), disk])
+            bodies = steps_per_second(PhysicsEngine(store, backend="tiled", integrator="leapfrog"), dt, 2)
+            line += f"  as bodies {bodies:10.2f} steps/s  speedup {tier / bodies:8.0f}x"
+
+        renderer = Renderer(None)
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            window.fill((0, 0, 0))
+            renderer.draw_particles(window, cloud.positions, cloud.colors, space_scale, camera)
+        line += f"  render {(time.perf_counter() - start) / args.frames * 1000:6.2f} ms"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    accuracy_parser = commands.add_parser(
+        "accuracy", help="Tiled and Barnes-Hut error against the direct sum, on a disk and an equal mass cluster"
+    )
+    accuracy_parser.add_argument("--n", type=int, default=2000)
+    accuracy_parser.add_argument("--seed", type=int, default=0)
+    accuracy_parser.add_argument("--theta", type=float, nargs="+", default=[0.3, 0.5, 0.7, 1.0])
+    accuracy_parser.add_argument("--tile", type=int, default=256, help="Rows per tile for the tiled backend")
+    accuracy_parser.add_argument("--max-error", type=float, default=0.02, help="Largest median relative error allowed")
+    accuracy_parser.add_argument("--max-p99", type=float, default=0.12, help="Largest 99th percentile relative error allowed")
+    accuracy_parser.add_argument("--check-theta", type=float, default=0.5, help="Largest theta held to --max-error")
+    accuracy_parser.set_defaults(run=accuracy)
+
+    tiled_parser = commands.add_parser("tiled", help="Check the tiled backend against the direct sum")
+    tiled_parser.add_argument("--n", type=int, nargs="+", default=[1, 2, 100, 1000, 3000])
+    tiled_parser.add_argument("--seed", type=int, default=0)
+    tiled_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    tiled_parser.add_argument("--tile", type=int, nargs="+", default=[1, 64, 256], help="Rows per tile")
+    tiled_parser.add_argument("--rtol", type=float, default=1e-12)
+    tiled_parser.set_defaults(run=tiled)
+
+    scaling_parser = commands.add_parser("scaling", help="Tiled steps/sec against the worker count")
+    scaling_parser.add_argument("--n", type=int, default=4000)
+    scaling_parser.add_argument("--seed", type=int, default=0)
+    scaling_parser.add_argument("--steps", type=int, default=10)
+    scaling_parser.add_argument("--dt", type=float, default=3600.0)
+    scaling_parser.add_argument(
+        "--workers", type=int, nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1})
+    )
+    scaling_parser.set_defaults(run=scaling)
+
+    integrators_parser = commands.add_parser("integrators", help="Wall time to reach a target energy error per scheme")
+    integrators_parser.add_argument("--target", type=float, default=1e-6)
+    integrators_parser.add_argument("--orbits", type=float, default=1.0)
+    integrators_parser.add_argument("--max-steps", type=int, default=200000)
+    integrators_parser.add_argument("--schemes", nargs="+", default=list(INTEGRATORS))
+    integrators_parser.set_defaults(run=integrators)
+
+    timesteps_parser = commands.add_parser("timesteps", help="Timestep modes against a fine fixed step on the Solar System")
+    timesteps_parser.add_argument("--days", type=float, default=91.0)
+    timesteps_parser.add_argument("--dt", type=float, default=86400.0, help="Largest step of the adaptive modes")
+    timesteps_parser.add_argument("--reference-dt", type=float, default=50.0)
+    timesteps_parser.add_argument("--max-error", type=float, default=0.01, help="Largest Earth-Moon separation error allowed")
+    timesteps_parser.add_argument("--check", nargs="+", default=["hierarchical"], help="Modes held to --max-error")
+    timesteps_parser.set_defaults(run=timesteps)
+
+    vector_parser = commands.add_parser("vector", help="Vector2D operations against the old ndarray version")
+    vector_parser.add_argument("--number", type=int, default=100000)
+    vector_parser.set_defaults(run=vector)
+
+    startup_parser = commands.add_parser("startup", help="Building every preset up front against registering them lazily")
+    startup_parser.add_argument("--presets", type=int, nargs="+", default=[3, 30, 100, 300])
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.add_argument("--assets", action="store_true", help="Also time decoding every sprite, needs pygame")
+    startup_parser.set_defaults(run=startup)
+
+    suite_parser = commands.add_parser(
+        "suite", help="Steps/sec, peak memory and render cost of synthetic systems, compared with a JSON baseline"
+    )
+    suite_parser.add_argument("--n", type=int, nargs="+", default=[10, 100, 1000, 10000, 50000])
+    suite_parser.add_argument("--seed", type=int, default=0)
+    suite_parser.add_argument("--backend", choices=PhysicsEngine.BACKENDS, help="Use one backend for every size")
+    suite_parser.add_argument("--budget", type=float, default=2.0, help="Seconds of stepping per size, shared by the repeats")
+    suite_parser.add_argument("--repeat", type=int, default=5, help="Samples per size, their median is reported")
+    suite_parser.add_argument("--frames", type=int, default=10, help="Frames rendered per size")
+    suite_parser.add_argument("--save", help="Write the results to this JSON file")
+    suite_parser.add_argument("--baseline", help="JSON file from an earlier --save to compare against")
+    suite_parser.add_argument("--tolerance", type=float, default=0.1, help="Relative change reported as a regression, widened by the spread of the repeats")
+    suite_parser.add_argument("--floor-ms", type=float, default=0.25, help="Smallest change in ms, or ms per step, reported")
+    suite_parser.add_argument("--floor-mb", type=float, default=1.0, help="Smallest change in peak MB reported")
+    suite_parser.set_defaults(run=suite)
+
+    precision_parser = commands.add_parser(
+        "precision", help="Float32 force error and speed against float64, with and without re-centering"
+    )
+    precision_parser.add_argument("--n", type=int, default=1000)
+    precision_parser.add_argument("--seed", type=int, default=0)
+    precision_parser.add_argument("--steps", type=int, default=100, help="Leapfrog steps over one dynamical time for the drift")
+    precision_parser.add_argument("--repeat", type=int, default=3)
+    precision_parser.set_defaults(run=precision)
+
+    ensemble_parser = commands.add_parser("ensemble", help="Stepping M copies as one ensemble against M engines")
+    ensemble_parser.add_argument("--members", type=int, nargs="+", default=[1, 10, 100, 1000])
+    ensemble_parser.add_argument("--n", type=int, default=10, help="Bodies in the disk system")
+    ensemble_parser.add_argument("--seed", type=int, default=0)
+    ensemble_parser.add_argument("--steps", type=int, default=100)
+    ensemble_parser.set_defaults(run=ensemble)
+
+    particles_parser = commands.add_parser("particles", help="Massless test particles against the same cloud as full bodies")
+    particles_parser.add_argument("--particles", type=int, nargs="+", default=[1000, 10000, 100000])
+    particles_parser.add_argument("--seed", type=int, default=0)
+    particles_parser.add_argument("--steps", type=int, default=20)
+    particles_parser.add_argument("--frames", type=int, default=20)
+    particles_parser.add_argument("--max-bodies", type=int, default=10000, help="Largest cloud also timed as full bodies")
+    particles_parser.set_defaults(run=particles)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
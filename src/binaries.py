@@ -0,0 +1,150 @@
+"""
+Close binaries split out of the engine step and subcycled on their own.
+
+A hard pair orbits many times per engine step, without help the whole system would have to
+take steps small enough to follow it. Instead the step is split in the manner of Wisdom & Holman
+(1991): kicks use every force except the pull of each pair on itself, and the drift moves the
+pair's center of mass in a straight line while the pair's relative orbit is integrated with
+as many small leapfrog substeps as its pericentre needs. Everything else keeps engine.dt.
+
+Pairs are picked again before every step, a body is in at most one pair.
+"""
+
+import numpy as np
+from collisions import collision_pairs
+from softening import inverse_cube
+
+# A bound pair is split out when its period is shorter than this many engine steps
+PERIOD_STEPS = 20
+# Substep as a fraction of the pair's pericentre timescale sqrt(r_p^3 / (G * M))
+SUBSTEP_FRACTION = 0.05
+MAX_SUBSTEPS = 4096
+
+
+class Binaries:
+    """
+    first / second | Rows of the two bodies of each pair
+    mu             | G * (m_first + m_second) of each pair
+    timescale      | Pericentre timescale of each pair in seconds, sets the substeps
+    softening      | Pair eps as in softening.py, None when unsoftened
+    kernel         | Softening kernel of the engine
+    """
+    def __init__(self, first, second, mu, timescale, softening, kernel):
+        self.first = first
+        self.second = second
+        self.mu = mu
+        self.timescale = timescale
+        self.softening = softening
+        self.kernel = kernel
+
+    @classmethod
+    def find(cls, engine, dt: float):
+        """
+        Bound pairs of the engine whose period is under PERIOD_STEPS steps of dt, tightest first
+        """
+        from physics import G
+
+        positions, velocities, masses = engine.positions, engine.velocities, engine.masses
+        longest = PERIOD_STEPS * abs(dt)
+        # A bound pair is never further apart than twice its semi-major axis, and that axis is
+        # below cbrt(G * M * (T / 2 pi)^2), splitting the cube root between the two masses
+        # makes it an overlap test for the spatial hash
+        reach = 2 * np.cbrt(G * masses * (longest / (2 * np.pi)) ** 2)
+        first, second = collision_pairs(positions, reach)
+
+        separation = positions[second] - positions[first]
+        relative = velocities[second] - velocities[first]
+        mu = G * (masses[first] + masses[second])
+        distance = np.sqrt(np.einsum("ij,ij->i", separation, separation))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            energy = 0.5 * np.einsum("ij,ij->i", relative, relative) - mu / distance
+            axis = -mu / (2 * energy)
+            period = 2 * np.pi * np.sqrt(axis**3 / mu)
+        hard = np.flatnonzero((energy < 0) & (period < longest))
+
+        taken = np.zeros(engine.N, dtype=bool)
+        chosen = []
+        for pair in hard[np.argsort(period[hard], kind="stable")]:
+            if not taken[first[pair]] and not taken[second[pair]]:
+                taken[first[pair]] = taken[second[pair]] = True
+                chosen.append(pair)
+        chosen = np.array(chosen, dtype=np.int64)
+
+        momentum = separation[chosen, 0] * relative[chosen, 1] - separation[chosen, 1] * relative[chosen, 0]
+        eccentricity = np.sqrt(np.maximum(1 + 2 * energy[chosen] * momentum**2 / mu[chosen] ** 2, 0.0))
+        pericentre = axis[chosen] * (1 - eccentricity)
+
+        softening = engine.softenings
+        if np.ndim(softening) == 1:
+            softening = np.maximum(softening[first[chosen]], softening[second[chosen]])
+        return cls(
+            first[chosen],
+            second[chosen],
+            mu[chosen],
+            np.sqrt(pericentre**3 / mu[chosen]),
+            softening,
+            engine.softening_kernel
+        )
+
+    def __len__(self):
+        return len(self.first)
+
+    @staticmethod
+    def same(pairs, other):
+        """
+        Whether two sets of pairs, either possibly None, hold the same bodies
+        """
+        if pairs is None or other is None:
+            return pairs is other
+        return np.array_equal(pairs.first, other.first) and np.array_equal(pairs.second, other.second)
+
+    def pull(self, separation):
+        """
+        Softened 1 / r^3 of every pair at the given separations
+        """
+        factor = np.zeros(len(separation))
+        inverse_cube(np.einsum("ij,ij->i", separation, separation), self.softening, self.kernel, factor)
+        return factor
+
+    def remove_mutual(self, engine):
+        """
+        Take the pull of each pair on itself out of engine.accelerations, drift() accounts for it
+        """
+        from physics import G
+
+        separation = engine.positions[self.second] - engine.positions[self.first]
+        pull = G * self.pull(separation)[:, np.newaxis] * separation
+        engine.accelerations[self.first] -= engine.masses[self.second, np.newaxis] * pull
+        engine.accelerations[self.second] += engine.masses[self.first, np.newaxis] * pull
+
+    def drift(self, engine, dt: float):
+        """
+        Drift every body by dt, each pair following its own orbit around its center of mass
+        """
+        first, second = self.first, self.second
+        positions, velocities, masses = engine.positions, engine.velocities, engine.masses
+        total = masses[first] + masses[second]
+        first_share = (masses[second] / total)[:, np.newaxis]
+        second_share = (masses[first] / total)[:, np.newaxis]
+
+        separation = positions[second] - positions[first]
+        relative = velocities[second] - velocities[first]
+        center_velocity = velocities[first] + second_share * relative
+
+        # Drift-kick-drift substeps of the relative orbit, pairs with fewer substeps sit the rest out
+        substeps = np.clip(np.ceil(abs(dt) / (SUBSTEP_FRACTION * self.timescale)), 1, MAX_SUBSTEPS)
+        substeps = substeps.astype(np.int64)
+        step = (dt / substeps)[:, np.newaxis]
+        uniform = (substeps == substeps.max(initial=0)).all()
+        for substep in range(int(substeps.max(initial=0))):
+            h = step if uniform else np.where(substep < substeps[:, np.newaxis], step, 0.0)
+            separation += 0.5 * h * relative
+            relative -= h * self.mu[:, np.newaxis] * self.pull(separation)[:, np.newaxis] * separation
+            separation += 0.5 * h * relative
+
+        positions += dt * velocities
+        center = positions[first] + second_share * (positions[second] - positions[first])
+        positions[first] = center - first_share * separation
+        positions[second] = center + second_share * separation
+        velocities[first] = center_velocity - first_share * relative
+        velocities[second] = center_velocity + second_share * relative
@@ -0,0 +1,140 @@
+"""
+Structure of arrays holding the state of every body in a system
+"""
+
+import numpy as np
+
+class BodyStore:
+    """
+    positions  | (N, 2) meters
+    velocities | (N, 2) m/s
+    masses     | (N,) kg
+    radii      | (N,) meters
+    scales     | (N,) sprite scale multipliers
+    colors     | (N, 3) uint8 RGB
+    softenings | (N,) gravitational softening length in meters, 0 uses the engine's default
+    ids        | (N,) row each body had when the system was built, kept when rows are removed
+    planets    | Planet views bound to the leading rows of this store, bulk rows past them have none
+    """
+    FIELDS = ("positions", "velocities", "masses", "radii", "scales", "colors", "softenings")
+
+    def __init__(self, n: int = 0):
+        self.positions = np.zeros((n, 2))
+        self.velocities = np.zeros((n, 2))
+        self.masses = np.zeros(n)
+        self.radii = np.zeros(n)
+        self.scales = np.ones(n)
+        self.colors = np.zeros((n, 3), dtype=np.uint8)
+        self.softenings = np.zeros(n)
+        self.ids = np.arange(n)
+        self.planets = []
+
+    @classmethod
+    def from_planets(cls, planets: list):
+        """
+        Copy the planets into one contiguous store and rebind them as views onto it
+        """
+        store = cls(len(planets))
+        for i, planet in enumerate(planets):
+            for field in BodyStore.FIELDS:
+                getattr(store, field)[i] = getattr(planet.store, field)[planet.index]
+            planet.bind(store, i)
+        store.planets = list(planets)
+        return store
+
+    @classmethod
+    def from_arrays(cls, positions, velocities, masses, radii=0.0, scales=1.0, colors=(180, 180, 180), softenings=0.0):
+        """
+        Store straight from arrays, no Planet objects, per body fields may be given as one value for all
+        """
+        store = cls(len(masses))
+        store.positions[:] = positions
+        store.velocities[:] = velocities
+        store.masses[:] = masses
+        store.radii[:] = radii
+        store.scales[:] = scales
+        store.colors[:] = colors
+        store.softenings[:] = softenings
+        return store
+
+    @classmethod
+    def concatenate(cls, stores: list):
+        """
+        Rows of every store in order, their planets rebound to the result.
+        Planets must stay the leading rows, so stores with planets go first.
+        """
+        store = cls(sum(len(part) for part in stores))
+        for field in BodyStore.FIELDS:
+            np.concatenate([getattr(part, field) for part in stores], out=getattr(store, field))
+
+        offset = 0
+        for part in stores:
+            for planet in part.planets:
+                planet.bind(store, offset + planet.index)
+            store.planets.extend(part.planets)
+            offset += len(part)
+        return store
+
+    def subset(self, rows):
+        """
+        New store holding the rows selected by the mask rows, its planets stay bound to this store
+        """
+        store = BodyStore()
+        for field in BodyStore.FIELDS + ("ids",):
+            setattr(store, field, getattr(self, field)[rows])
+        store.planets = [planet for planet in self.planets if rows[planet.index]]
+        return store
+
+    def copy(self):
+        return self.subset(np.ones(len(self), dtype=bool))
+
+    def compact(self, keep):
+        """
+        Drop the rows where keep is False, every field gets a new array.
+        Planets of dropped rows are unbound, the rest are rebound to their new rows.
+        """
+        planets = []
+        for planet in self.planets:
+            if keep[planet.index]:
+                planets.append(planet)
+            else:
+                planet.unbind()
+
+        for field in BodyStore.FIELDS + ("ids",):
+            setattr(self, field, getattr(self, field)[keep])
+
+        rows = np.cumsum(keep) - 1
+        for planet in planets:
+            planet.bind(self, int(rows[planet.index]))
+        self.planets = planets
+
+    def checkpoint(self):
+        """
+        Copy of every field, restore() puts it back
+        """
+        checkpoint = {field: getattr(self, field).copy() for field in BodyStore.FIELDS}
+        checkpoint["ids"] = self.ids.copy()
+        return checkpoint
+
+    def restore(self, checkpoint: dict, planets=None):
+        """
+        Copy a checkpoint back. At the same size it is copied in place and arrays handed out
+        before stay valid, otherwise every field gets a new array and planets, if given,
+        are rebound to the leading rows. Fields missing from older checkpoints get their defaults.
+        """
+        defaults = BodyStore(len(checkpoint["masses"]))
+        if len(checkpoint["masses"]) == len(self):
+            for field in BodyStore.FIELDS:
+                np.copyto(getattr(self, field), checkpoint.get(field, getattr(defaults, field)))
+        else:
+            for field in BodyStore.FIELDS:
+                setattr(self, field, np.array(checkpoint.get(field, getattr(defaults, field)), dtype=getattr(self, field).dtype))
+        self.ids = np.array(checkpoint.get("ids", np.arange(len(self))))
+
+        if planets is not None:
+            for i, planet in enumerate(planets):
+                planet.bind(self, i)
+            self.planets = list(planets)
+
+    def __len__(self):
+        return len(self.masses)
@@ -0,0 +1,68 @@
+"""
+Body tables read straight into a BodyStore, no Planet object is made per row.
+
+    .csv | Header line naming the columns, any of COLUMNS in any order
+    .npy | Structured array with fields named like COLUMNS, or a plain 2D array in COLUMNS order
+    .npz | Arrays named like the BodyStore fields: positions, velocities, masses, and optionally radii, scales, colors, softenings
+
+x, y, vx, vy and mass are required, radius, scale, color and softening fall back to the defaults given.
+"""
+
+import numpy as np
+from pathlib import Path
+from bodies import BodyStore
+
+COLUMNS = ("x", "y", "vx", "vy", "mass", "radius", "scale", "r", "g", "b", "softening")
+REQUIRED = ("x", "y", "vx", "vy", "mass")
+
+
+def read_table(path, radius=0.0, scale=1.0, color=(180, 180, 180), softening=0.0):
+    path = Path(path)
+    if path.suffix == ".npz":
+        with np.load(path) as arrays:
+            return BodyStore.from_arrays(
+                arrays["positions"],
+                arrays["velocities"],
+                arrays["masses"],
+                arrays["radii"] if "radii" in arrays else radius,
+                arrays["scales"] if "scales" in arrays else scale,
+                arrays["colors"] if "colors" in arrays else color,
+                arrays["softenings"] if "softenings" in arrays else softening
+            )
+
+    if path.suffix == ".csv":
+        with open(path) as file:
+            names = [name.strip() for name in file.readline().split(",")]
+        data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    elif path.suffix == ".npy":
+        data = np.load(path)
+        if data.dtype.names:
+            names = list(data.dtype.names)
+            data = np.column_stack([data[name] for name in names]).astype(np.float64)
+        else:
+            names = list(COLUMNS[:data.shape[1]])
+    else:
+        raise ValueError(f"Unknown table format '{path.suffix}', expected .csv, .npy or .npz")
+
+    return from_columns(dict(zip(names, data.T)), radius, scale, color, softening)
+
+
+def from_columns(columns: dict, radius=0.0, scale=1.0, color=(180, 180, 180), softening=0.0):
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns {sorted(unknown)}, expected some of {COLUMNS}")
+    missing = [name for name in REQUIRED if name not in columns]
+    if missing:
+        raise ValueError(f"Missing columns {missing}")
+
+    if all(channel in columns for channel in "rgb"):
+        color = np.column_stack((columns["r"], columns["g"], columns["b"]))
+    return BodyStore.from_arrays(
+        np.column_stack((columns["x"], columns["y"])),
+        np.column_stack((columns["vx"], columns["vy"])),
+        columns["mass"],
+        columns.get("radius", radius),
+        columns.get("scale", scale),
+        color,
+        columns.get("softening", softening)
+    )
@@ -0,0 +1,138 @@
+"""
+Collision detection and inelastic merging of overlapping bodies.
+
+The broad phase is a uniform grid spatial hash, cells as wide as the largest diameter
+among the small bodies, so two overlapping small bodies always share a cell or touch
+neighbouring ones. Candidate pairs come from sorting the cell keys and binary searching
+the neighbour keys, all vectorized. The few largest bodies would blow the cells up for
+everyone, they are tested against every body directly instead, O(LARGE_BODIES * N).
+"""
+
+import numpy as np
+from bodies import BodyStore
+
+LARGE_BODIES = 32
+# Half of the 3 x 3 neighbourhood, pairs in the other half are found from their other body
+HALF_NEIGHBOURHOOD = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def collision_pairs(positions: np.ndarray, radii: np.ndarray):
+    """
+    Index arrays (first, second) with first < second of every pair of overlapping bodies
+    """
+    n = len(radii)
+    if n < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    by_size = np.argsort(radii, kind="stable")
+    sorted_radii = radii[by_size]
+    split = max(n - LARGE_BODIES, 0)
+    if split:
+        # Only bodies well above the rest are worth testing one at a time
+        split = max(split, int(np.searchsorted(sorted_radii, 2 * sorted_radii[split - 1], side="right")))
+    first, second = [], []
+    for pairs in (_large_pairs(positions, radii, by_size[split:]), _grid_pairs(positions, radii, by_size[:split])):
+        first.append(np.minimum(*pairs))
+        second.append(np.maximum(*pairs))
+    first, second = np.concatenate(first), np.concatenate(second)
+
+    # Large bodies also find each other from both sides
+    unique = np.unique(first * n + second)
+    return unique // n, unique % n
+
+
+def _large_pairs(positions, radii, large):
+    first, second = [], []
+    for body in large:
+        offsets = positions - positions[body]
+        reach = radii + radii[body]
+        hits = np.flatnonzero(np.einsum("ij,ij->i", offsets, offsets) < reach * reach)
+        hits = hits[hits != body]
+        first.append(np.full(len(hits), body))
+        second.append(hits)
+    if not first:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(first), np.concatenate(second)
+
+
+def _grid_pairs(positions, radii, small):
+    empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    if len(small) < 2:
+        return empty
+
+    points = positions[small]
+    low = points.min(axis=0)
+    span = (points.max(axis=0) - low).max()
+    # Keys must fit an int64, tiny bodies spread far apart get coarser cells
+    cell = max(2 * radii[small].max(), span / 2**30)
+    if cell <= 0:
+        return empty
+
+    cells = ((points - low) // cell).astype(np.int64)
+    # A spare column so y - 1 and y + 1 never land in the next column's cells
+    height = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0] * height + cells[:, 1]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    count = len(small)
+
+    first, second = [], []
+    for dx, dy in HALF_NEIGHBOURHOOD:
+        target = sorted_keys + (dx * height + dy)
+        start = np.searchsorted(sorted_keys, target, side="left")
+        stop = np.searchsorted(sorted_keys, target, side="right")
+        if dx == 0 and dy == 0:
+            # Same cell, only bodies later in the sort so each pair is found once
+            start = np.arange(1, count + 1)
+        counts = np.maximum(stop - start, 0)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+
+        # Expand every [start, stop) range into its sorted positions
+        a = np.repeat(np.arange(count), counts)
+        b = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(start, counts)
+        first.append(small[order[a]])
+        second.append(small[order[b]])
+
+    if not first:
+        return empty
+    first, second = np.concatenate(first), np.concatenate(second)
+
+    offsets = positions[first] - positions[second]
+    reach = radii[first] + radii[second]
+    hit = np.einsum("ij,ij->i", offsets, offsets) < reach * reach
+    return first[hit], second[hit]
+
+
+def merge(store: BodyStore, first: np.ndarray, second: np.ndarray):
+    """
+    Merge every connected group of overlapping bodies into its lowest row, conserving
+    mass, momentum and the center of mass, the volume sets the new radius.
+    Returns the mask of rows to keep, the caller compacts the store.
+    """
+    n = len(store)
+    group = np.arange(n)
+    # Every pair takes the lower label of the two until chains A-B, B-C settle on A
+    while True:
+        low = np.minimum(group[first], group[second])
+        if (group[first] == low).all() and (group[second] == low).all():
+            break
+        np.minimum.at(group, first, low)
+        np.minimum.at(group, second, low)
+        group = group[group]
+
+    total_mass = np.bincount(group, store.masses, n)
+    # Groups of massless bodies are averaged by count instead
+    weights = np.where(total_mass[group] > 0, store.masses, 1.0)
+    total_weight = np.bincount(group, weights, n)
+
+    roots = np.unique(group[first])
+    for field in ("positions", "velocities"):
+        values = getattr(store, field)
+        weighted = np.column_stack([np.bincount(group, weights * values[:, axis], n) for axis in range(2)])
+        values[roots] = weighted[roots] / total_weight[roots, np.newaxis]
+
+    store.radii[roots] = np.cbrt(np.bincount(group, store.radii**3, n)[roots])
+    store.masses[roots] = total_mass[roots]
+    return group == np.arange(n)
@@ -7,3 +7,11 @@ class Config:
     Font_Size: int = 16
     Window: tuple[int, int] = (1200, 800)
     Assets_Folder: str = "../assets"
+    Presets_Folder: str = "../presets"
+    Physics_Workers: int = 1
+    Sprite_Cache_Bytes: int = 64 * 2**20
+    # Only repaint the background under last frame's drawings while the camera is still
+    Background_Dirty_Rects: bool = False
+    Profiles_Folder: str = "../profiles"
+    # Bodies that get an orbit trail, named planets first and then the heaviest
+    Max_Trails: int = 100
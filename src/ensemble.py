@@ -0,0 +1,368 @@
+"""
+Many perturbed copies of one small system stepped together, for stability studies.
+
+Member m's bodies are row m of (M, N, 2) position and velocity arrays and every force
+evaluation is a few numpy calls over a block of members, so the Python cost of a step
+no longer grows with M. Members never feel each other.
+
+    python ensemble.py "Earth & Moon" --members 500 --vary Moon.velocity=0.05 --duration 2.4e6
+    python ensemble.py "Solar System" --members 200 --vary Jupiter.mass=0.5:uniform --csv runs/jupiter.csv
+
+Members use the direct sum with (N, N) buffers each, the preset's backend, timestep mode,
+collisions and binaries are ignored. Suits the hand built presets, not 10k body clusters.
+"""
+
+import argparse
+import csv
+import time
+import numpy as np
+from pathlib import Path
+from physics import G, BYTES_PER_PAIR
+from integrators import Integrator, get_integrator
+from softening import body_softenings, check_kernel, pair_softening, inverse_cube, inverse_distance
+
+# closest      | Smallest distance between two bodies of the member seen by any force evaluation
+# farthest     | Largest distance of a body from the member's center of mass at the samples
+# energy_error | Largest relative energy error at the samples
+# unbound      | Bodies with positive energy relative to the rest at the end, escaped or escaping
+STATISTICS = ("closest", "farthest", "energy_error", "unbound")
+DISTRIBUTIONS = ("normal", "uniform", "grid")
+
+
+class EnsembleEngine:
+    """
+    positions     | (M, N, 2) initial positions of every member, copied
+    velocities    | (M, N, 2) initial velocities of every member, copied
+    masses        | (M, N) masses of every member, or (N,) shared by all of them
+    softenings    | (N,) per body eps as in BodyStore, 0 where softening applies
+    integrator    | Name from integrators.INTEGRATORS or an Integrator, as for PhysicsEngine
+    softening     | Softening length eps in meters for bodies without their own
+    kernel        | Softening kernel, "plummer" or "spline", see softening.py
+    memory_budget | Bytes of pairwise buffers, the members are summed a block at a time
+    """
+    def __init__(
+        self,
+        positions: np.ndarray,
+        velocities: np.ndarray,
+        masses: np.ndarray,
+        softenings=None,
+        integrator: str | Integrator = "leapfrog",
+        softening=0.0,
+        kernel="plummer",
+        memory_budget=64 * 2**20
+    ):
+        check_kernel(kernel)
+        self.positions = np.array(positions, dtype=np.float64)
+        self.velocities = np.array(velocities, dtype=np.float64)
+        self.M, self.N = self.positions.shape[:2]
+        self.masses = np.array(np.broadcast_to(masses, (self.M, self.N)), dtype=np.float64)
+        self.accelerations = np.zeros_like(self.positions)
+        self.integrator = get_integrator(integrator)
+        self.softening_kernel = kernel
+        self.softenings = body_softenings(
+            np.zeros(self.N) if softenings is None else np.asarray(softenings, dtype=np.float64), softening
+        )
+        self.pair_softenings = pair_softening(self.softenings, slice(None))
+        self.steps = 0
+
+        self.block = int(min(max(self.M, 1), max(1, memory_budget // (max(self.N, 1) ** 2 * BYTES_PER_PAIR))))
+        self.displacements = np.zeros((self.block, self.N, self.N, 2))
+        self.dist_squared = np.zeros((self.block, self.N, self.N))
+        self.inv_dist_cubed = np.zeros((self.block, self.N, self.N))
+        self.closest = np.full(self.M, np.inf)
+
+    @classmethod
+    def from_preset(cls, preset, members: int, memory_budget=64 * 2**20):
+        """
+        members identical copies of the preset's bodies, perturb the arrays before stepping
+        """
+        store = preset.store
+        return cls(
+            np.broadcast_to(store.positions, (members, len(store), 2)),
+            np.broadcast_to(store.velocities, (members, len(store), 2)),
+            store.masses,
+            store.softenings,
+            integrator=preset.integrator,
+            softening=preset.softening,
+            kernel=preset.softening_kernel,
+            memory_budget=memory_budget
+        )
+
+    def pairs(self, start: int, stop: int):
+        """
+        Displacements r_j - r_i and squared distances of members start:stop, the diagonal set to inf.
+        Views into the shared buffers, valid until the next call.
+        """
+        displacements = self.displacements[:stop - start]
+        dist_squared = self.dist_squared[:stop - start]
+        positions = self.positions[start:stop]
+        np.subtract(positions[:, np.newaxis, :, :], positions[:, :, np.newaxis, :], out=displacements)
+        np.einsum('bijk,bijk->bij', displacements, displacements, out=dist_squared)
+        diagonal = np.arange(self.N)
+        dist_squared[:, diagonal, diagonal] = np.inf
+        return displacements, dist_squared
+
+    def compute_accelerations(self):
+        for start in range(0, self.M, self.block):
+            stop = min(start + self.block, self.M)
+            displacements, dist_squared = self.pairs(start, stop)
+            if self.N > 1:
+                np.minimum(self.closest[start:stop], np.sqrt(dist_squared.min(axis=(1, 2))), out=self.closest[start:stop])
+
+            inv_dist_cubed = self.inv_dist_cubed[:stop - start]
+            inv_dist_cubed.fill(0.0)
+            inverse_cube(dist_squared, self.pair_softenings, self.softening_kernel, inv_dist_cubed)
+            inv_dist_cubed *= self.masses[start:stop, np.newaxis, :]
+            np.einsum('bij,bijk->bik', inv_dist_cubed, displacements, out=self.accelerations[start:stop])
+        self.accelerations *= G
+        return self.accelerations
+
+    def kick(self, dt: float):
+        self.velocities += dt * self.accelerations
+
+    def drift(self, dt: float):
+        self.positions += dt * self.velocities
+
+    def step_n(self, n: int, dt: float):
+        for _ in range(n):
+            self.integrator.step(self, dt)
+            self.steps += 1
+
+    def invalidate(self):
+        """
+        Drop forces cached between steps, call after changing the state from outside
+        """
+        self.integrator.reset()
+
+    def potentials(self):
+        """
+        (M, N) gravitational potential at every body from the other bodies of its member
+        """
+        potentials = np.zeros((self.M, self.N))
+        for start in range(0, self.M, self.block):
+            stop = min(start + self.block, self.M)
+            _, dist_squared = self.pairs(start, stop)
+            inv_dist = np.zeros_like(dist_squared)
+            inverse_distance(np.sqrt(dist_squared), self.pair_softenings, self.softening_kernel, inv_dist, np.isfinite(dist_squared))
+            potentials[start:stop] = -G * np.einsum('bij,bj->bi', inv_dist, self.masses[start:stop])
+        return potentials
+
+    def center_of_mass(self):
+        """
+        (M, 2) positions and (M, 2) velocities of every member's center of mass
+        """
+        total = self.masses.sum(axis=1)[:, np.newaxis]
+        return (
+            np.einsum('mi,mij->mj', self.masses, self.positions) / total,
+            np.einsum('mi,mij->mj', self.masses, self.velocities) / total,
+        )
+
+    def energies(self, potentials=None):
+        """
+        (M,) total energy of every member
+        """
+        potentials = self.potentials() if potentials is None else potentials
+        kinetic = 0.5 * np.einsum('mi,mij,mij->m', self.masses, self.velocities, self.velocities)
+        return kinetic + 0.5 * np.einsum('mi,mi->m', self.masses, potentials)
+
+    def unbound(self, potentials=None):
+        """
+        (M, N) whether each body has positive energy relative to its member's center of mass
+        """
+        potentials = self.potentials() if potentials is None else potentials
+        _, center_velocity = self.center_of_mass()
+        relative = self.velocities - center_velocity[:, np.newaxis, :]
+        return 0.5 * np.einsum('mij,mij->mi', relative, relative) + potentials > 0
+
+    def farthest(self):
+        """
+        (M,) largest distance of a body from its member's center of mass
+        """
+        center, _ = self.center_of_mass()
+        offsets = self.positions - center[:, np.newaxis, :]
+        return np.sqrt(np.einsum('mij,mij->mi', offsets, offsets).max(axis=1, initial=0.0))
+
+
+class Variation:
+    """
+    body         | Name of a planet in the preset, or a row of its store
+    field        | "mass", "velocity" (scaled along its direction) or "position" (offset from the
+                 | center of mass scaled along its direction)
+    spread       | Members get the base value times 1 + spread * x
+    distribution | x drawn from "normal" N(0, 1), "uniform" U(-1, 1), or a "grid" evenly over [-1, 1]
+    """
+    FIELDS = ("mass", "velocity", "position")
+
+    def __init__(self, body: str | int, field: str, spread: float, distribution="normal"):
+        if field not in Variation.FIELDS:
+            raise ValueError(f"Unknown field '{field}', expected one of {Variation.FIELDS}")
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{distribution}', expected one of {DISTRIBUTIONS}")
+        self.body = body
+        self.field = field
+        self.spread = spread
+        self.distribution = distribution
+
+    @classmethod
+    def parse(cls, text: str):
+        """
+        Variation from "Body.field=spread" or "Body.field=spread:distribution", a number as body is a row
+        """
+        target, _, value = text.partition("=")
+        body, _, field = target.rpartition(".")
+        spread, _, distribution = value.partition(":")
+        if not body or not spread:
+            raise ValueError(f"Expected Body.field=spread[:distribution], got '{text}'")
+        return cls(int(body) if body.isdigit() else body, field, float(spread), distribution or "normal")
+
+    @property
+    def label(self):
+        return f"{self.body}.{self.field}"
+
+    def row(self, store):
+        if isinstance(self.body, int):
+            if not 0 <= self.body < len(store):
+                raise ValueError(f"Row {self.body} is outside the {len(store)} bodies of the preset")
+            return self.body
+        names = [planet.name for planet in store.planets]
+        if self.body not in names:
+            raise ValueError(f"No body named '{self.body}', available: {names}")
+        return names.index(self.body)
+
+    def factors(self, members: int, rng):
+        if self.distribution == "grid":
+            x = np.linspace(-1.0, 1.0, members) if members > 1 else np.zeros(members)
+        elif self.distribution == "uniform":
+            x = rng.uniform(-1.0, 1.0, members)
+        else:
+            x = rng.standard_normal(members)
+        return 1 + self.spread * x
+
+    def apply(self, engine: EnsembleEngine, row: int, rng):
+        """
+        Perturb row of every member in place, returns the (M,) factors used
+        """
+        factors = self.factors(engine.M, rng)
+        if self.field == "mass":
+            engine.masses[:, row] *= factors
+        elif self.field == "velocity":
+            engine.velocities[:, row] *= factors[:, np.newaxis]
+        else:
+            center, _ = engine.center_of_mass()
+            offset = engine.positions[:, row] - center
+            engine.positions[:, row] = center + factors[:, np.newaxis] * offset
+        engine.invalidate()
+        return factors
+
+
+class SweepResult:
+    """
+    parameters | Variation label -> (M,) factor its quantity was multiplied by in each member
+    statistics | Name from STATISTICS -> (M,) value of each member
+    engine     | EnsembleEngine at the end of the run, for the final states
+    """
+    def __init__(self, parameters: dict, statistics: dict, engine: EnsembleEngine):
+        self.parameters = parameters
+        self.statistics = statistics
+        self.engine = engine
+
+    def summary(self):
+        """
+        Spread of every statistic over the members
+        """
+        return {
+            name: {
+                "mean": float(values.mean()),
+                "std": float(values.std()),
+                "min": float(values.min()),
+                "median": float(np.median(values)),
+                "p95": float(np.percentile(values, 95)),
+                "max": float(values.max()),
+            }
+            for name, values in self.statistics.items()
+        }
+
+    def to_csv(self, path):
+        """
+        One row per member, the factors of every variation followed by its statistics
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        columns = {**self.parameters, **self.statistics}
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["member", *columns])
+            for member in range(self.engine.M):
+                writer.writerow([member, *(float(values[member]) for values in columns.values())])
+
+
+def sweep(preset, variations: list, members: int, duration: float, dt=None, samples=100, seed=0, memory_budget=64 * 2**20):
+    """
+    Run members perturbed copies of preset for duration simulated seconds with fixed steps of dt,
+    the preset's dt when None. Every variation draws its own factors, so several fields vary
+    independently. Returns a SweepResult.
+    """
+    rng = np.random.default_rng(seed)
+    engine = EnsembleEngine.from_preset(preset, members, memory_budget)
+    parameters = {
+        variation.label: variation.apply(engine, variation.row(preset.store), rng)
+        for variation in variations
+    }
+
+    dt = dt or preset.dt
+    steps = max(1, round(duration / abs(dt)))
+    every = max(1, steps // samples)
+    initial = engine.energies()
+    energy_error = np.zeros(members)
+    farthest = engine.farthest()
+    done = 0
+    while done < steps:
+        engine.step_n(min(every, steps - done), dt)
+        done += min(every, steps - done)
+        potentials = engine.potentials()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            error = np.abs((engine.energies(potentials) - initial) / initial)
+        energy_error = np.fmax(energy_error, error)
+        farthest = np.maximum(farthest, engine.farthest())
+
+    statistics = {
+        "closest": engine.closest.copy(),
+        "farthest": farthest,
+        "energy_error": energy_error,
+        "unbound": engine.unbound(potentials).sum(axis=1).astype(np.float64),
+    }
+    return SweepResult(parameters, statistics, engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("preset", help="Name of the preset to perturb")
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument(
+        "--vary", action="append", required=True, metavar="BODY.FIELD=SPREAD[:DISTRIBUTION]",
+        help=f"Repeatable, fields {Variation.FIELDS}, distributions {DISTRIBUTIONS}"
+    )
+    parser.add_argument("--duration", type=float, required=True, help="Simulated seconds")
+    parser.add_argument("--dt", type=float, help="Step in seconds, the preset's by default")
+    parser.add_argument("--samples", type=int, default=100, help="Times the energy and spread are checked")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="Write one row per member to this file")
+    args = parser.parse_args()
+
+    from headless import find_preset
+
+    preset = find_preset(args.preset)
+    variations = [Variation.parse(text) for text in args.vary]
+    start = time.perf_counter()
+    result = sweep(preset, variations, args.members, args.duration, args.dt, args.samples, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.members} members of {len(preset.store)} bodies, {result.engine.steps} steps in {elapsed:.2f} s")
+    for name, summary in result.summary().items():
+        print(f"{name:<13} " + "  ".join(f"{key}={value:.3e}" for key, value in summary.items()))
+    if args.csv:
+        result.to_csv(args.csv)
+        print(f"Wrote {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Procedural systems for stress tests, each returns a BodyStore without Planet objects.
+
+Positions and velocities are relative to `center` and `velocity`, so a generated
+system can orbit or ride along with a named body listed in the same preset.
+"""
+
+import numpy as np
+from bodies import BodyStore
+from physics import G
+
+
+def plummer(
+    n: int,
+    total_mass: float,
+    scale_radius: float,
+    center=(0.0, 0.0),
+    velocity=(0.0, 0.0),
+    radius=1e5,
+    scale=1,
+    color=(255, 240, 200),
+    softening=0.0,
+    seed=0
+):
+    """
+    Plummer sphere star cluster sampled as in Aarseth, Henon & Wielen (1974) and projected
+    onto the plane, so it starts close to but not exactly in equilibrium.
+    """
+    rng = np.random.default_rng(seed)
+    # The outermost 0.1% of the mass is dropped, it lands absurdly far out
+    mass_fraction = rng.uniform(0.0, 0.999, n)
+    r = scale_radius / np.sqrt(mass_fraction ** (-2 / 3) - 1)
+
+    # Speed as a fraction q of the local escape speed, g(q) = q^2 (1 - q^2)^3.5 by rejection
+    q = np.empty(n)
+    missing = np.arange(n)
+    while len(missing):
+        trial = rng.uniform(0.0, 1.0, len(missing))
+        accepted = rng.uniform(0.0, 0.1, len(missing)) < trial**2 * (1 - trial**2) ** 3.5
+        q[missing[accepted]] = trial[accepted]
+        missing = missing[~accepted]
+    speed = q * np.sqrt(2 * G * total_mass / np.sqrt(r**2 + scale_radius**2))
+
+    return BodyStore.from_arrays(
+        positions=_isotropic(rng, n) * r[:, None] + center,
+        velocities=_isotropic(rng, n) * speed[:, None] + velocity,
+        masses=np.full(n, total_mass / n),
+        radii=radius,
+        scales=scale,
+        colors=color,
+        softenings=softening
+    )
+
+
+def keplerian_disk(
+    n: int,
+    central_mass: float,
+    inner: float,
+    outer: float,
+    body_mass=1e20,
+    center=(0.0, 0.0),
+    velocity=(0.0, 0.0),
+    radius=1e5,
+    scale=1,
+    color=(180, 180, 180),
+    softening=0.0,
+    seed=0
+):
+    """
+    n bodies spread evenly over the area between inner and outer meters,
+    each on a circular counterclockwise orbit around central_mass
+    """
+    rng = np.random.default_rng(seed)
+    r = np.sqrt(rng.uniform(inner**2, outer**2, n))
+    angle = rng.uniform(0.0, 2 * np.pi, n)
+    speed = np.sqrt(G * central_mass / r)
+    cos, sin = np.cos(angle), np.sin(angle)
+
+    return BodyStore.from_arrays(
+        positions=np.column_stack((r * cos, r * sin)) + center,
+        velocities=np.column_stack((-speed * sin, speed * cos)) + velocity,
+        masses=np.full(n, body_mass),
+        radii=radius,
+        scales=scale,
+        colors=color,
+        softenings=softening
+    )
+
+
+def ring(
+    n: int,
+    central_mass: float,
+    semi_major_axis: float,
+    eccentricity=0.0,
+    periapsis_angle=0.0,
+    body_mass=1e20,
+    center=(0.0, 0.0),
+    velocity=(0.0, 0.0),
+    radius=1e5,
+    scale=1,
+    color=(180, 180, 180),
+    softening=0.0
+):
+    """
+    n bodies sharing one Keplerian orbit around central_mass, spaced evenly in mean anomaly.
+    periapsis_angle is in radians from the x axis, the orbit runs counterclockwise.
+    """
+    mean_anomaly = 2 * np.pi * np.arange(n) / n
+    # Kepler's equation by Newton's method, converges in a few steps below e = 0.9
+    eccentric_anomaly = mean_anomaly.copy() if eccentricity < 0.8 else np.full(n, np.pi)
+    for _ in range(30):
+        eccentric_anomaly -= (eccentric_anomaly - eccentricity * np.sin(eccentric_anomaly) - mean_anomaly) \
+            / (1 - eccentricity * np.cos(eccentric_anomaly))
+
+    cos, sin = np.cos(eccentric_anomaly), np.sin(eccentric_anomaly)
+    minor = np.sqrt(1 - eccentricity**2)
+    anomaly_rate = np.sqrt(G * central_mass / semi_major_axis**3) / (1 - eccentricity * cos)
+    positions = semi_major_axis * np.column_stack((cos - eccentricity, minor * sin))
+    velocities = semi_major_axis * anomaly_rate[:, None] * np.column_stack((-sin, minor * cos))
+
+    rotation = np.array([
+        [np.cos(periapsis_angle), np.sin(periapsis_angle)],
+        [-np.sin(periapsis_angle), np.cos(periapsis_angle)],
+    ])
+    return BodyStore.from_arrays(
+        positions=positions @ rotation + center,
+        velocities=velocities @ rotation + velocity,
+        masses=np.full(n, body_mass),
+        radii=radius,
+        scales=scale,
+        colors=color,
+        softenings=softening
+    )
+
+
+def _isotropic(rng, n: int):
+    """
+    In plane components of n random unit vectors in 3D
+    """
+    z = rng.uniform(-1.0, 1.0, n)
+    phi = rng.uniform(0.0, 2 * np.pi, n)
+    planar = np.sqrt(1 - z**2)
+    return np.column_stack((planar * np.cos(phi), planar * np.sin(phi)))
+
+
+GENERATORS = {
+    generator.__name__: generator
+    for generator in (plummer, keplerian_disk, ring)
+}
+
+
+def generate(kind: str, **parameters):
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown generator '{kind}', expected one of {tuple(GENERATORS)}")
+    return GENERATORS[kind](**parameters)
@@ -0,0 +1,156 @@
+"""
+Run a preset without a window, as fast as the CPU allows.
+Never imports pygame, so it works on machines without a display.
+
+    python headless.py "Solar System" --duration 3.15e7 --snapshot-every 86400 --output runs/solar
+    python headless.py "Earth & Moon" --steps 100000
+    python headless.py "Solar System" --duration 3.15e8 --snapshot-every 86400 --record runs/solar.rec --float32
+    python headless.py "Solar System" --duration 3.15e9 --snapshot-every 3.15e7 --checkpoint runs/solar.npz --resume
+    python headless.py --list
+"""
+
+import argparse
+import time
+import numpy as np
+from pathlib import Path
+from assets import AssetManager
+from physics import PhysicsEngine
+from recording import Recorder
+
+
+def load_presets():
+    AssetManager.HEADLESS = True
+    # Imported late so no preset can load a sprite before HEADLESS is set
+    from presets import get_presets
+    return get_presets()
+
+
+def find_preset(name: str):
+    presets = load_presets()
+    for preset in presets:
+        if preset.name == name:
+            return preset.load()
+    raise ValueError(f"No preset named '{name}', available: {[preset.name for preset in presets]}")
+
+
+class HeadlessRunner:
+    """
+    preset            | Preset to integrate
+    output            | Folder for snapshot_XXXXXX.npz files, None to keep no snapshots
+    snapshot_interval | Simulated seconds between snapshots, None for only the first and last
+    workers           | Threads for the "tiled" backend
+    recorder          | Recorder that also gets a frame at every snapshot, None to record nothing
+    checkpoint        | .npz file rewritten with the full state at every snapshot, None for no checkpoints
+    """
+    def __init__(self, preset, output=None, snapshot_interval=None, workers=1, recorder=None, checkpoint=None):
+        self.preset = preset
+        self.engine = PhysicsEngine.from_preset(preset, workers=workers)
+        self.output = Path(output) if output else None
+        self.snapshot_interval = snapshot_interval
+        self.recorder = recorder
+        self.checkpoint = checkpoint
+        self.time_elapsed = 0.0
+        self.snapshots = 0
+
+        if self.output:
+            self.output.mkdir(parents=True, exist_ok=True)
+
+    def resume(self):
+        """
+        Continue from the checkpoint file, returns False when there is none yet
+        """
+        if not self.checkpoint or not Path(self.checkpoint).exists():
+            return False
+        self.time_elapsed = self.engine.load(self.checkpoint)
+        return True
+
+    def snapshot(self):
+        if self.checkpoint:
+            self.engine.save(self.checkpoint, self.time_elapsed)
+        if self.recorder:
+            self.recorder.record(self.time_elapsed, self.engine.positions, self.engine.velocities, self.engine.store.ids)
+        if not self.output:
+            return
+        np.savez(
+            self.output / f"snapshot_{self.snapshots:06d}.npz",
+            time=self.time_elapsed,
+            positions=self.engine.positions,
+            velocities=self.engine.velocities,
+            masses=self.engine.masses,
+            ids=self.engine.store.ids,
+            names=np.array([planet.name for planet in self.engine.objects_list]),
+            **(self.engine.particles.checkpoint() if self.engine.particles is not None else {}),
+        )
+        self.snapshots += 1
+
+    def run(self, duration: float):
+        """
+        Advance duration simulated seconds, snapshotting along the way.
+        Returns the simulated time reached, whole steps only for the "fixed" mode.
+        Intervals shorter than a fixed step are carried over, a snapshot follows every step then.
+        """
+        interval = self.snapshot_interval or duration
+        end = self.time_elapsed + duration
+        # Time handed to the engine, ahead of time_elapsed by what the "fixed" mode carries over
+        requested = self.time_elapsed
+
+        self.snapshot()
+        while end - requested >= self.engine.dt * 1e-9:
+            chunk = min(interval, end - requested)
+            requested += chunk
+            advanced = self.engine.advance(chunk)
+            if advanced == 0.0:
+                continue
+            self.time_elapsed += advanced
+            self.snapshot()
+        return self.time_elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("preset", nargs="?", help="Preset name, as shown on its button")
+    parser.add_argument("--list", action="store_true", help="List the presets and exit")
+    span = parser.add_mutually_exclusive_group()
+    span.add_argument("--steps", type=int, help="Number of preset dt steps to run")
+    span.add_argument("--duration", type=float, help="Simulated seconds to run")
+    parser.add_argument("--snapshot-every", type=float, help="Simulated seconds between snapshots")
+    parser.add_argument("--output", help="Folder to write snapshots to")
+    parser.add_argument("--record", help="Recording file to stream every snapshot into, play it with main.py")
+    parser.add_argument("--float32", action="store_true", help="Record positions and velocities as float32")
+    parser.add_argument("--checkpoint", help="File to keep the latest state in, rewritten at every snapshot")
+    parser.add_argument("--resume", action="store_true", help="Continue from --checkpoint if it exists, --duration/--steps still count from t=0")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.list:
+        for preset in load_presets():
+            print(preset.name)
+        return
+    if not args.preset or (args.steps is None and args.duration is None):
+        parser.error("a preset and one of --steps or --duration are required")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint")
+
+    preset = find_preset(args.preset)
+    duration = args.duration if args.duration is not None else args.steps * preset.dt
+    recorder = Recorder(args.record, preset, np.float32 if args.float32 else np.float64) if args.record else None
+    runner = HeadlessRunner(preset, args.output, args.snapshot_every, args.workers, recorder, args.checkpoint)
+    if args.resume and runner.resume():
+        print(f"Resuming from {args.checkpoint} at {runner.time_elapsed:.6g} s")
+
+    resumed_at = runner.time_elapsed
+    start = time.perf_counter()
+    simulated = runner.run(max(duration - resumed_at, 0.0)) - resumed_at
+    elapsed = time.perf_counter() - start
+    if recorder:
+        recorder.close()
+        print(f"{recorder.frames} frames recorded to {args.record}")
+
+    print(
+        f"{preset.name}: {simulated:.6g} s simulated in {elapsed:.2f} s wall "
+        f"({simulated / preset.dt / elapsed:,.0f} dt/s), {runner.snapshots} snapshots"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Time integration schemes for PhysicsEngine.
+
+Every integrator advances the engine's positions/velocities in place by one step
+of dt, asking the engine for fresh accelerations whenever it needs them.
+"""
+
+import numpy as np
+
+
+class Integrator:
+    name = ""
+    # Force evaluations per step, to compare schemes at equal cost
+    force_evaluations = 1
+
+    def reset(self):
+        """
+        Forget anything cached between steps, called when the state is changed from outside
+        """
+
+    def step(self, engine, dt: float):
+        raise NotImplementedError
+
+
+class SemiImplicitEuler(Integrator):
+    """
+    First order symplectic Euler, kick then drift
+    """
+    name = "euler"
+
+    def step(self, engine, dt: float):
+        engine.compute_accelerations()
+        engine.kick(dt)
+        engine.drift(dt)
+
+
+class Leapfrog(Integrator):
+    """
+    Second order kick-drift-kick leapfrog (velocity Verlet).
+    The closing kick's accelerations open the next step, so it costs one force evaluation.
+    """
+    name = "leapfrog"
+
+    def __init__(self):
+        self.has_accelerations = False
+
+    def reset(self):
+        self.has_accelerations = False
+
+    def step(self, engine, dt: float):
+        if not self.has_accelerations:
+            engine.compute_accelerations()
+        engine.kick(0.5 * dt)
+        engine.drift(dt)
+        engine.compute_accelerations()
+        engine.kick(0.5 * dt)
+        self.has_accelerations = True
+
+
+class Yoshida4(Integrator):
+    """
+    Fourth order symplectic scheme of Yoshida (1990), three leapfrog substeps
+    with weights chosen to cancel the third order error
+    """
+    name = "yoshida4"
+    force_evaluations = 3
+
+    W1 = 1.0 / (2.0 - 2.0 ** (1.0 / 3.0))
+    W0 = -(2.0 ** (1.0 / 3.0)) * W1
+    DRIFTS = (0.5 * W1, 0.5 * (W0 + W1), 0.5 * (W0 + W1), 0.5 * W1)
+    KICKS = (W1, W0, W1)
+
+    def step(self, engine, dt: float):
+        for drift, kick in zip(Yoshida4.DRIFTS, Yoshida4.KICKS):
+            engine.drift(drift * dt)
+            engine.compute_accelerations()
+            engine.kick(kick * dt)
+        engine.drift(Yoshida4.DRIFTS[-1] * dt)
+
+
+class RK4(Integrator):
+    """
+    Classic fourth order Runge-Kutta, not symplectic so energy drifts on long runs
+    """
+    name = "rk4"
+    force_evaluations = 4
+
+    def step(self, engine, dt: float):
+        positions, velocities = engine.positions, engine.velocities
+        x0 = positions.copy()
+        v0 = velocities.copy()
+
+        a1 = engine.compute_accelerations().copy()
+
+        np.add(x0, 0.5 * dt * v0, out=positions)
+        a2 = engine.compute_accelerations().copy()
+        v2 = v0 + 0.5 * dt * a1
+
+        np.add(x0, 0.5 * dt * v2, out=positions)
+        a3 = engine.compute_accelerations().copy()
+        v3 = v0 + 0.5 * dt * a2
+
+        np.add(x0, dt * v3, out=positions)
+        a4 = engine.compute_accelerations()
+        v4 = v0 + dt * a3
+
+        np.add(x0, (dt / 6.0) * (v0 + 2.0 * v2 + 2.0 * v3 + v4), out=positions)
+        np.add(v0, (dt / 6.0) * (a1 + 2.0 * a2 + 2.0 * a3 + a4), out=velocities)
+
+
+INTEGRATORS = {
+    integrator.name: integrator
+    for integrator in (SemiImplicitEuler, Leapfrog, Yoshida4, RK4)
+}
+
+
+def get_integrator(integrator):
+    """
+    Integrator instance from a name in INTEGRATORS or an Integrator passed through
+    """
+    if isinstance(integrator, Integrator):
+        return integrator
+    if integrator not in INTEGRATORS:
+        raise ValueError(f"Unknown integrator '{integrator}', expected one of {tuple(INTEGRATORS)}")
+    return INTEGRATORS[integrator]()
@@ -1,4 +1,7 @@
+import sys
+import time
 from copy import deepcopy
+from pathlib import Path
 import pygame
 import pygame.freetype
 from enum import Enum, auto
@@ -8,10 +11,16 @@ from vector import Vector2D
 from mouse import Mouse
 from assets import AssetManager
 from physics import PhysicsEngine
+from physics_thread import PhysicsThread
+from recording import Playback
 from presets import Preset, get_presets
+from trails import TrailBuffer
+from renderer import Renderer
+from background import Background
+from profiler import FrameProfiler, PHASES
 from copy import deepcopy
 
-from pygame.locals import K_a, K_d, K_o, K_p
+from pygame.locals import K_a, K_d, K_o, K_p, K_h, K_x
 
 class State(Enum):
     Init    = auto()
@@ -24,17 +33,22 @@ class Simulation:
         pygame.freetype.init()
 
         self.FONT = pygame.freetype.Font(Config.Font_Path, Config.Font_Size)
+        self.renderer = Renderer(self.FONT)
         self.window = pygame.display.set_mode(Config.Window, pygame.RESIZABLE)
         pygame.display.set_caption(Config.Name)
 
         self.state = State(State.Init)
         self.mouse = Mouse()
 
-        AssetManager().load_all()
-
-        self.background_image = AssetManager().get_asset("stars")
+        self.background = Background(AssetManager().get_asset("stars"))
+        # Rects drawn over the background this frame, restored next frame when the camera is still
+        self.dirty = []
         self.camera_vector = Vector2D(0.0, 0.0)
 
+        # Off until toggled, the HUD is rendered again only every few frames
+        self.profiler = FrameProfiler()
+        self.profiler_hud = None
+
         self.presets = get_presets()
         self.load_preset(Preset("empty", [], 100, 100))
 
@@ -44,31 +58,53 @@ class Simulation:
         self.buttons = self.create_buttons()
 
     def load_preset(self, preset):
+        # Where the drawn positions come from, a PhysicsThread or a recording's Playback.
+        # Stopped first, the running engine may be stepping this preset's store
+        self.stop_source()
         preset.reset()
+        self.show_preset(preset)
+        self.source = PhysicsThread(PhysicsEngine.from_preset(preset, workers=Config.Physics_Workers))
+        self.source.start()
+
+    def show_preset(self, preset):
+        """
+        Clock, view and trails for the bodies of preset, the caller sets the source of their positions
+        """
         self.objects = preset.objects
         self.time_scale = preset.dt * 10
         self.time_elapsed = 0
         self.dt = preset.dt
         self.space_scale = preset.space_scale
-        self.physics = PhysicsEngine(preset.objects)
+        # Interpolated positions drawn this frame and the bodies they belong to,
+        # the engine's own arrays belong to the source
+        self.positions = preset.store.positions.copy()
+        self.bodies = preset.store.copy()
+        self.particles = None
+        self.trails = TrailBuffer.for_store(preset.store, Config.Max_Trails)
         self.camera_vector = Vector2D(0.0, 0.0)
 
+    def stop_source(self):
+        if getattr(self, "source", None):
+            self.source.stop()
+
+    def load_recording(self, path):
+        # Playback only reads the file, no engine is built for its bodies
+        playback = Playback(path)
+        self.stop_source()
+        self.show_preset(playback.preset())
+        self.source = playback
+        self.time_elapsed = float(playback.times[0])
+
     def draw_background(self):
-        image_width = self.background_image.get_width()
-        image_height = self.background_image.get_height()
-        window_width, window_height = self.window.get_size()
         parallax_factor = (1 / self.space_scale) * 0.02
-        parallax_offset_x = self.camera_vector.x * parallax_factor
-        parallax_offset_y = -self.camera_vector.y * parallax_factor
-        x_tiles = window_width // image_width + 2
-        y_tiles = window_height // image_height + 2
-        x_start = - (parallax_offset_x % image_width)
-        y_start = - (parallax_offset_y % image_height)
-        for x in range(x_tiles):
-            for y in range(y_tiles):
-                pos_x = x_start + x * image_width
-                pos_y = y_start + y * image_height
-                self.window.blit(self.background_image, (pos_x, pos_y))
+        dirty = self.dirty if Config.Background_Dirty_Rects else None
+        self.background.draw(
+            self.window,
+            self.camera_vector.x * parallax_factor,
+            -self.camera_vector.y * parallax_factor,
+            dirty
+        )
+        self.dirty = []
 
     def event_handler(self):
         zoom_factor = 1.0
@@ -78,20 +114,26 @@ class Simulation:
                 break
             elif event.type == pygame.VIDEORESIZE:
                 self.window = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
+                self.background.resize(self.window.get_size())
             elif event.type == pygame.KEYDOWN:
                 if event.key == K_o:
                     self.time_scale *= 0.5
                 elif event.key == K_p:
                     self.time_scale *= 1.5
+                elif event.key == K_h:
+                    self.profiler.toggle()
+                    self.profiler_hud = None
+                elif event.key == K_x and self.profiler.enabled:
+                    self.export_profile()
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 mouse_pos = pygame.mouse.get_pos()
                 for button in self.buttons:
                     if button['rect'].collidepoint(mouse_pos):
-                        self.load_preset(button['preset'])
+                        self.load_preset(button['preset'].load())
 
     def handle_zoom(self):
         mouse_pos = Vector2D(*pygame.mouse.get_pos())
-        mouse_pos.vector[1] = self.window.get_height() - mouse_pos.y
+        mouse_pos.y = self.window.get_height() - mouse_pos.y
 
         world_mouse_pos = (mouse_pos * self.space_scale) + self.camera_vector
 
@@ -104,13 +146,16 @@ class Simulation:
             self.camera_vector = world_mouse_pos - (mouse_pos * self.space_scale)
 
     def render(self):
-        for planet in self.objects:
-            p_pos, p_rad = planet.draw(self.window, self.space_scale, self.camera_vector)
-            if p_pos and p_rad:
-                label_x, label_y = p_pos.vector
-                label_surface, label_rect = self.FONT.render(planet.name, planet.color)
-                label_rect.center = (label_x, label_y + p_rad + 10)
-                self.window.blit(label_surface, label_rect)
+        self.trails.push(self.positions)
+        self.trails.draw(self.window, self.bodies.colors, self.space_scale, self.camera_vector, self.dirty)
+        if self.particles is not None:
+            self.renderer.draw_particles(self.window, *self.particles, self.space_scale, self.camera_vector, self.dirty)
+
+        visible = self.renderer.draw(
+            self.window, self.bodies, self.positions, self.space_scale, self.camera_vector, self.dirty
+        )
+        # Trails restart when a body comes back into view
+        self.trails.clear(~visible)
 
     def display_ui(self, fps: float):
         line_length_pixels = 100
@@ -118,22 +163,64 @@ class Simulation:
 
         text_surface, rect = self.FONT.render(f"Scale: {line_distance:,.0f} km", (255, 255, 255))
         rect.topleft = (10, 10)
-        self.window.blit(text_surface, rect)
+        self.dirty.append(self.window.blit(text_surface, rect))
 
         line_start = (10, rect.bottom + 10)
         line_end = (10 + line_length_pixels, rect.bottom + 10)
-        pygame.draw.line(self.window, (255, 255, 255), line_start, line_end, 2)
+        self.dirty.append(pygame.draw.line(self.window, (255, 255, 255), line_start, line_end, 2))
 
         fps_text, fps_rect = self.FONT.render(f"{fps:.0f}", (255, 255, 255))
         fps_rect.topright = (self.window.get_width() - 10, 10)
-        self.window.blit(fps_text, fps_rect)
+        self.dirty.append(self.window.blit(fps_text, fps_rect))
 
         years, _ = divmod(self.time_elapsed, 31536000)
         months, _ = divmod(self.time_elapsed, 2628000)
         days, _ = divmod(self.time_elapsed, 86400)
         sim_time_text, sim_time_rect = self.FONT.render(f"Time: {int(years)}y {int(months)}m {int(days)}d", (255, 255, 255))
         sim_time_rect.bottomleft = (10, self.window.get_height() - 10)
-        self.window.blit(sim_time_text, sim_time_rect)
+        self.dirty.append(self.window.blit(sim_time_text, sim_time_rect))
+
+    def display_profiler(self):
+        if self.profiler_hud is None or self.profiler.count % 15 == 0:
+            self.profiler_hud = self.render_profiler()
+        rect = self.profiler_hud.get_rect(topright=(self.window.get_width() - 10, 40))
+        self.dirty.append(self.window.blit(self.profiler_hud, rect))
+
+    def render_profiler(self):
+        summary = self.profiler.summary()
+        lines = [("frame", "ms, p95")]
+        if summary:
+            lines += [
+                (name, f"{summary[name]['mean_ms']:.1f}, {summary[name]['p95_ms']:.1f}")
+                for name in PHASES + ("total",)
+            ]
+            lines += [
+                ("engine", f"{summary['engine_ms']:.1f} ms"),
+                ("steps", f"{summary['steps_per_frame']:.1f} / frame"),
+                ("speed", f"{summary['speed'] * 100:.0f}% of time scale"),
+            ]
+        lines.append(("h hide", "x export"))
+
+        line_height = self.FONT.get_sized_height() + 2
+        hud = pygame.Surface((230, 10 + line_height * len(lines)), pygame.SRCALPHA)
+        hud.fill((0, 0, 0, 170))
+        for i, (name, value) in enumerate(lines):
+            y = 5 + i * line_height
+            self.FONT.render_to(hud, (8, y), name, (200, 200, 200))
+            value_rect = self.FONT.get_rect(value)
+            self.FONT.render_to(hud, (hud.get_width() - 8 - value_rect.width, y), value, (255, 255, 255))
+        return hud
+
+    def export_profile(self):
+        """
+        Write the profiled frames to Config.Profiles_Folder as CSV and JSON
+        """
+        folder = Path(Config.Profiles_Folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        stem = folder / time.strftime("profile-%Y%m%d-%H%M%S")
+        self.profiler.to_csv(stem.with_suffix(".csv"))
+        self.profiler.to_json(stem.with_suffix(".json"))
+        print(f"Profile written to {stem}.csv and {stem}.json")
 
     def create_buttons(self):
         buttons = []
@@ -150,15 +237,15 @@ class Simulation:
 
     def draw_buttons(self):
         for button in self.buttons:
-            pygame.draw.rect(self.window, (100, 100, 100), button['rect'])
+            self.dirty.append(pygame.draw.rect(self.window, (100, 100, 100), button['rect']))
             pygame.draw.rect(self.window, (150, 150, 150), button['rect'], 2)
-            text_surface, text_rect = self.FONT.render(button['text'], (255, 255, 255))
+            text_surface, text_rect = self.renderer.label(button['text'], (255, 255, 255))
             text_rect.center = button['rect'].center
             self.window.blit(text_surface, text_rect)
 
     def loop(self):
         clock = pygame.time.Clock()
-        accumulator = 0.0
+        profiler = self.profiler
 
         while self.state != State.Quit:
             frame_time = clock.tick(60) / 1000.0
@@ -167,25 +254,46 @@ class Simulation:
                 frame_time = 0.25
 
             scaled_frame_time = frame_time * self.time_scale
-            accumulator += scaled_frame_time
+            profiler.begin()
 
             self.event_handler()
+            profiler.mark("events")
 
             self.handle_zoom()
             self.camera_vector += self.mouse.mouse_event(self.space_scale)
             self.draw_background()
-
-            # Physics
-            while accumulator >= self.dt:
-                self.physics.update_objects(self.dt)
-                accumulator -= self.dt
-                self.time_elapsed += self.dt
+            profiler.mark("background")
+
+            # Physics runs on its own thread, show the latest state it has reached
+            # and let it work a couple of frames ahead so the next ones rarely wait
+            shown = self.time_elapsed
+            self.source.request(self.time_elapsed + 3 * scaled_frame_time)
+            self.time_elapsed, self.positions, bodies = self.source.positions(self.time_elapsed + scaled_frame_time)
+            if bodies is not self.bodies:
+                self.trails.follow(bodies.ids)
+                self.bodies = bodies
+            self.particles = self.source.particles()
+            profiler.mark("physics")
+            if profiler.enabled:
+                profiler.physics(*self.source.stats(), scaled_frame_time, self.time_elapsed - shown)
 
             self.render()
+            profiler.mark("render")
             self.draw_buttons()
+            profiler.mark("buttons")
             self.display_ui(clock.get_fps())
+            profiler.mark("ui")
+            if profiler.enabled:
+                self.display_profiler()
+                profiler.mark("hud")
 
             pygame.display.update()
+            profiler.mark("display")
+
+        self.source.stop()
 
 if __name__ == "__main__":
-    Simulation().loop()
+    simulation = Simulation()
+    if len(sys.argv) > 1:
+        simulation.load_recording(sys.argv[1])
+    simulation.loop()
@@ -23,12 +23,13 @@ class Mouse:
                 delta_y = pos[1] - self.mouse_position[1]
                 target_vector = space_scale * Vector2D(delta_x, delta_y) * 0.09
                 self.drag_velocity += target_vector
-                camera_vector_change = self.drag_velocity
+                # Copy, the damping below updates drag_velocity in place
+                camera_vector_change = self.drag_velocity.copy()
                 self.drag_velocity *= Mouse.MOVE_DAMP
                 self.mouse_position = pos
         else:
             if self.drag_velocity.magnitude > 0.01:
-                camera_vector_change = self.drag_velocity
+                camera_vector_change = self.drag_velocity.copy()
                 self.drag_velocity *= Mouse.MOVE_DAMP
             else:
                 self.drag_velocity = Vector2D(0.0, 0.0)
@@ -0,0 +1,88 @@
+"""
+Massless test particles, dust and debris that feel the gravity of the bodies but pull on nothing.
+
+A particle costs N_massive force terms a step, where a body adds a row and a column to the N x N sum,
+so a preset can carry a cloud of 100k particles around a few planets. Particles keep their own
+arrays outside the BodyStore and are drawn one pixel each by Renderer.draw_particles.
+
+Every engine step is wrapped in a kick-drift-kick leapfrog of the particles: begin() kicks them
+with the field of the bodies where the step starts, end() drifts them and kicks again with the
+bodies where the step left them. The engine's integrator and timestep mode move the bodies in
+between, particles always take whole steps of the engine's step.
+"""
+
+import numpy as np
+from bodies import BodyStore
+from physics import BYTES_PER_PAIR, allocate_tile, field_rows
+
+
+class TestParticles:
+    """
+    positions  | (P, 2) meters, copied
+    velocities | (P, 2) meters per second, copied
+    colors     | (P, 3) RGB of every particle, or one color for all of them
+    """
+    FIELDS = ("particle_positions", "particle_velocities")
+
+    def __init__(self, positions, velocities, colors=(200, 200, 200)):
+        self.positions = np.array(positions, dtype=np.float64).reshape(-1, 2)
+        self.velocities = np.array(velocities, dtype=np.float64).reshape(-1, 2)
+        self.colors = np.array(np.broadcast_to(np.asarray(colors, dtype=np.uint8), (len(self.positions), 3)))
+        self.accelerations = np.zeros_like(self.positions)
+        self.has_accelerations = False
+        self.buffers = None
+
+    @classmethod
+    def from_store(cls, store: BodyStore):
+        """
+        Particles where the bodies of store are, their masses and sizes are dropped
+        """
+        return cls(store.positions, store.velocities, store.colors)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def reset(self):
+        """
+        Forget the cached field, the bodies were changed from outside
+        """
+        self.has_accelerations = False
+
+    def compute_accelerations(self, engine):
+        """
+        Field of engine's bodies at every particle, a block of particles at a time within engine.memory_budget
+        """
+        rows = int(min(max(len(self), 1), max(1, engine.memory_budget // (max(engine.N, 1) * BYTES_PER_PAIR))))
+        if self.buffers is None or self.buffers[1].shape != (rows, engine.N):
+            self.buffers = allocate_tile(rows, engine.N)
+        for start in range(0, len(self), rows):
+            field_rows(
+                self.positions, engine.positions, engine.masses, self.accelerations, start, min(start + rows, len(self)),
+                self.buffers, engine.softenings, engine.softening_kernel
+            )
+        self.has_accelerations = True
+        return self.accelerations
+
+    def begin(self, engine, dt: float):
+        """
+        Opening half kick, call before the bodies take their step of dt
+        """
+        if not self.has_accelerations:
+            self.compute_accelerations(engine)
+        self.velocities += 0.5 * dt * self.accelerations
+
+    def end(self, engine, dt: float):
+        """
+        Drift and closing half kick, call once the bodies finished their step of dt
+        """
+        self.positions += dt * self.velocities
+        self.compute_accelerations(engine)
+        self.velocities += 0.5 * dt * self.accelerations
+
+    def checkpoint(self):
+        return {"particle_positions": self.positions.copy(), "particle_velocities": self.velocities.copy()}
+
+    def restore(self, checkpoint: dict):
+        np.copyto(self.positions, checkpoint["particle_positions"])
+        np.copyto(self.velocities, checkpoint["particle_velocities"])
+        self.reset()
@@ -1,29 +1,386 @@
-from vector import Vector2D
 from planet import Planet
+from bodies import BodyStore
+from quadtree import QuadTree
+from collisions import collision_pairs, merge
+from binaries import Binaries
+from softening import check_kernel, body_softenings, pair_softening, inverse_cube, inverse_cube_and_slope, inverse_distance
+from integrators import Integrator, get_integrator
+from timesteps import get_timestep
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from pathlib import Path
 
 G = 6.6743015 * 10**-11
 
+# Float64 displacement (2), squared distance and inverse distance cubed per body pair
+BYTES_PER_PAIR = 4 * 8
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+# Force evaluations between updates of the float32 reference frame
+RECENTER_EVERY = 64
+
+
+def tile_rows(n_bodies: int, memory_budget: int, dtype=np.float64):
+    """
+    Largest number of rows whose (rows, N) pairwise buffers of dtype fit in memory_budget bytes
+    """
+    if n_bodies == 0:
+        return 1
+    bytes_per_pair = BYTES_PER_PAIR // 8 * np.dtype(dtype).itemsize
+    return int(min(n_bodies, max(1, memory_budget // (n_bodies * bytes_per_pair))))
+
+
+# Thread pools shared by every engine, presets are reloaded often
+_POOLS = {}
+
+
+def get_pool(workers: int):
+    if workers not in _POOLS:
+        _POOLS[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="physics")
+    return _POOLS[workers]
+
+
+def allocate_tile(rows: int, n_bodies: int, dtype=np.float64):
+    return (
+        np.zeros((rows, n_bodies, 2), dtype=dtype),
+        np.zeros((rows, n_bodies), dtype=dtype),
+        np.zeros((rows, n_bodies), dtype=dtype),
+    )
+
+
+def sum_pairs(inv_dist_cubed, displacements, out):
+    """
+    out[i] = sum_j inv_dist_cubed[i, j] * displacements[i, j], masses already folded into inv_dist_cubed.
+    Float32 buffers are summed into the float64 out without a float64 copy of the pairs,
+    displacements is overwritten then.
+    """
+    if displacements.dtype == out.dtype:
+        np.einsum('ij,ijk->ik', inv_dist_cubed, displacements, out=out)
+    else:
+        displacements *= inv_dist_cubed[:, :, np.newaxis]
+        np.sum(displacements, axis=1, dtype=out.dtype, out=out)
+
+
+def direct_sum_rows(positions, masses, out, start, stop, buffers, softenings=None, kernel="plummer"):
+    """
+    Exact acceleration of bodies start:stop from every body, written to out[start:stop].
+    buffers come from allocate_tile and must hold at least stop - start rows.
+    softenings and kernel soften close pairs, see softening.py.
+    """
+    rows = stop - start
+    displacements, dist_squared, inv_dist_cubed = (buffer[:rows] for buffer in buffers)
+
+    np.subtract(positions[np.newaxis, :, :], positions[start:stop, np.newaxis, :], out=displacements)
+    np.einsum('ijk,ijk->ij', displacements, displacements, out=dist_squared)
+
+    # Self interaction sits on the shifted diagonal of this tile
+    dist_squared[np.arange(rows), np.arange(start, stop)] = np.inf
+    inv_dist_cubed.fill(0.0)
+    inverse_cube(dist_squared, pair_softening(softenings, slice(start, stop)), kernel, inv_dist_cubed)
+
+    inv_dist_cubed *= masses[np.newaxis, :]
+    sum_pairs(inv_dist_cubed, displacements, out[start:stop])
+    out[start:stop] *= G
+
+
+def direct_sum_targets(positions, masses, out, targets, buffers, softenings=None, kernel="plummer"):
+    """
+    Exact acceleration of the bodies in the index array targets, written to out[targets].
+    buffers come from allocate_tile and must hold at least len(targets) rows.
+    """
+    rows = len(targets)
+    displacements, dist_squared, inv_dist_cubed = (buffer[:rows] for buffer in buffers)
+
+    np.subtract(positions[np.newaxis, :, :], positions[targets, np.newaxis, :], out=displacements)
+    np.einsum('ijk,ijk->ij', displacements, displacements, out=dist_squared)
+
+    dist_squared[np.arange(rows), targets] = np.inf
+    inv_dist_cubed.fill(0.0)
+    inverse_cube(dist_squared, pair_softening(softenings, targets), kernel, inv_dist_cubed)
+
+    inv_dist_cubed *= masses[np.newaxis, :]
+    summed = np.empty((rows, 2), dtype=out.dtype)
+    sum_pairs(inv_dist_cubed, displacements, summed)
+    out[targets] = G * summed
+
+
+def field_rows(points, positions, masses, out, start, stop, buffers, softenings=None, kernel="plummer"):
+    """
+    Acceleration at points start:stop from every body, written to out[start:stop].
+    The points are not bodies, so no pair is skipped as a self interaction.
+    softenings are the bodies' own eps from body_softenings.
+    """
+    rows = stop - start
+    displacements, dist_squared, inv_dist_cubed = (buffer[:rows] for buffer in buffers)
+
+    np.subtract(positions[np.newaxis, :, :], points[start:stop, np.newaxis, :], out=displacements)
+    np.einsum('ijk,ijk->ij', displacements, displacements, out=dist_squared)
+
+    inv_dist_cubed.fill(0.0)
+    softening = softenings if np.ndim(softenings) == 0 else softenings[np.newaxis, :]
+    inverse_cube(dist_squared, softening, kernel, inv_dist_cubed)
+
+    inv_dist_cubed *= masses[np.newaxis, :]
+    sum_pairs(inv_dist_cubed, displacements, out[start:stop])
+    out[start:stop] *= G
+
+
+def acceleration_and_jerk(positions, velocities, masses, targets, memory_budget=64 * 2**20, softenings=None, kernel="plummer"):
+    """
+    Exact acceleration and its time derivative (jerk) for the bodies in targets
+        a_i = G * sum m_j * r_ij / r^3
+        j_i = G * sum m_j * (v_ij / r^3 - 3 * (r_ij . v_ij) * r_ij / r^5)
+    with 1 / r^3 and its slope softened when softenings is given
+    """
+    n_bodies = len(masses)
+    accelerations = np.zeros((len(targets), 2))
+    jerks = np.zeros((len(targets), 2))
+    rows = tile_rows(n_bodies, memory_budget)
+
+    for start in range(0, len(targets), rows):
+        chunk = targets[start:start + rows]
+        displacements = positions[np.newaxis, :, :] - positions[chunk, np.newaxis, :]
+        relative_velocities = velocities[np.newaxis, :, :] - velocities[chunk, np.newaxis, :]
+        dist_squared = np.einsum('ijk,ijk->ij', displacements, displacements)
+        dist_squared[np.arange(len(chunk)), chunk] = np.inf
+
+        inv_dist_cubed, slope = inverse_cube_and_slope(dist_squared, pair_softening(softenings, chunk), kernel)
+        inv_dist_cubed *= masses[np.newaxis, :]
+        slope *= masses[np.newaxis, :]
+        slope *= np.einsum('ijk,ijk->ij', displacements, relative_velocities)
+
+        accelerations[start:start + rows] = np.einsum('ij,ijk->ik', inv_dist_cubed, displacements)
+        jerks[start:start + rows] = np.einsum('ij,ijk->ik', inv_dist_cubed, relative_velocities) \
+            + np.einsum('ij,ijk->ik', slope, displacements)
+
+    return G * accelerations, G * jerks
+
+
+def potential_energy(positions, masses, memory_budget=64 * 2**20, softenings=None, kernel="plummer"):
+    """
+    -G * sum over pairs of m_i * m_j / r_ij, summed a block of rows at a time,
+    1 / r_ij softened when softenings is given
+    """
+    n_bodies = len(masses)
+    rows = tile_rows(n_bodies, memory_budget)
+    energy = 0.0
+    for start in range(0, n_bodies, rows):
+        stop = min(start + rows, n_bodies)
+        displacements = positions[np.newaxis, :, :] - positions[start:stop, np.newaxis, :]
+        dist = np.sqrt(np.einsum('ijk,ijk->ij', displacements, displacements))
+
+        # Each pair once: only columns right of the diagonal
+        upper = np.arange(n_bodies)[np.newaxis, :] > np.arange(start, stop)[:, np.newaxis]
+        inv_dist = np.zeros_like(dist)
+        inverse_distance(dist, pair_softening(softenings, slice(start, stop)), kernel, inv_dist, upper)
+        energy -= masses[start:stop] @ inv_dist @ masses
+    return G * energy
+
+
 class PhysicsEngine:
-    def __init__(self, objects_list: list[Planet]):
-        self.objects_list = objects_list
-        self.N = len(objects_list)
+    """
+    bodies        | BodyStore to simulate in place, or a list of Planets to gather into one
+    backend       | "direct" exact O(N^2) sum with N x N buffers
+                  | "tiled" exact sum computed a block of rows at a time, O(N * tile) memory
+                  | "barnes_hut" O(N log N) quadtree approximation
+    theta         | Barnes-Hut opening angle, smaller is more accurate and slower
+    memory_budget | Bytes the "tiled" backend may use for its pairwise buffers
+    tile_size     | Rows per tile for the "tiled" backend, overrides memory_budget
+    workers       | Threads sharing the "tiled" backend's rows, numpy releases the GIL in its kernels
+    integrator    | Name from integrators.INTEGRATORS ("euler", "leapfrog", "yoshida4", "rk4") or an Integrator
+    dt            | Step used by advance(), the largest step for the "adaptive" and "hierarchical" modes
+    timestep      | How advance() fills an interval: "fixed", "adaptive" or "hierarchical", see timesteps.py
+    tolerance     | Step accuracy parameter eta, a body's step is eta * |a| / |da/dt|
+    max_level     | Adaptive steps are never smaller than dt / 2**max_level
+    collisions    | Merge overlapping bodies after every step, the store shrinks as they merge
+    softening     | Softening length eps in meters for bodies without their own, 0 for Newtonian gravity
+    kernel        | Softening kernel, "plummer" or "spline", see softening.py
+    binaries      | Subcycle hard binaries inside each step, see binaries.py, needs "fixed" steps
+                  | and a kick-drift integrator
+    precision     | "float64", or "float32" pairwise buffers for the "direct" and "tiled" backends.
+                  | Positions stay float64, forces are evaluated relative to the center of mass
+                  | in units of the system's size and summed back in float64, see update_frame()
+    particles     | TestParticles pulled along by the bodies without pulling back, see particles.py
+    """
+    BACKENDS = ("direct", "tiled", "barnes_hut")
 
-        self.positions = np.zeros((self.N, 2))
-        self.masses = np.zeros(self.N)
-        self.velocities = np.zeros((self.N, 2))
+    def __init__(
+        self,
+        bodies: BodyStore | list[Planet],
+        backend="direct",
+        theta=0.5,
+        memory_budget=64 * 2**20,
+        tile_size=None,
+        workers=1,
+        integrator: str | Integrator = "euler",
+        dt=None,
+        timestep="fixed",
+        tolerance=0.02,
+        max_level=10,
+        collisions=False,
+        softening=0.0,
+        kernel="plummer",
+        binaries=False,
+        precision="float64",
+        particles=None
+    ):
+        if backend not in PhysicsEngine.BACKENDS:
+            raise ValueError(f"Unknown physics backend '{backend}', expected one of {PhysicsEngine.BACKENDS}")
+        if workers > 1 and backend != "tiled":
+            raise ValueError(f"workers={workers} is only supported by the 'tiled' backend")
+        check_kernel(kernel)
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {tuple(PRECISIONS)}")
+        if precision == "float32" and backend == "barnes_hut":
+            raise ValueError("precision='float32' is only supported by the 'direct' and 'tiled' backends")
+
+        if not isinstance(bodies, BodyStore):
+            bodies = BodyStore.from_planets(bodies)
+
+        self.store = bodies
+        self.backend = backend
+        self.theta = theta
+        self.workers = workers
+        self.memory_budget = memory_budget
+        self.requested_tile_size = tile_size
+        self.integrator = get_integrator(integrator)
+        self.dt = dt
+        self.timestep = get_timestep(timestep, tolerance, max_level)
+        self.collisions = collisions
+        self.softening = softening
+        self.softening_kernel = kernel
+        self.binaries = binaries
+        self.precision = precision
+        self.dtype = PRECISIONS[precision]
+        self.particles = particles
+        if binaries and (self.timestep.name != "fixed" or self.integrator.name == "rk4"):
+            raise ValueError("binaries need the 'fixed' timestep and a kick-drift integrator, not 'rk4'")
+        # Every planet the system started with, to rebind them when a larger state is restored
+        self.planets_by_id = {int(bodies.ids[i]): planet for i, planet in enumerate(bodies.planets)}
+        # Steps taken since the engine was made, for profiling
+        self.steps = 0
+        self.bind_store()
+
+    def bind_store(self):
+        """
+        Take the store's current arrays and size the buffers to them,
+        call after the store's arrays are replaced by compact() or a restore of another size
+        """
+        # State arrays are the store's own buffers, they must only be updated in place
+        self.objects_list = self.store.planets
+        self.N = len(self.store)
+        self.positions = self.store.positions
+        self.masses = self.store.masses
+        self.velocities = self.store.velocities
         self.accelerations = np.zeros((self.N, 2))
-        self.displacements = np.zeros((self.N, self.N, 2))
-        self.dist_squared = np.zeros((self.N, self.N))
-        self.inv_dist_cubed = np.zeros((self.N, self.N))
-        self.accel_contributions = np.zeros((self.N, self.N, 2))
+        self.target_buffers = None
+        self.softenings = body_softenings(self.store.softenings, self.softening)
+        self.pairs = None
 
-    def update_objects(self, TIME_DELTA):
-        # Update positions, masses, velocities from objects_list
-        for i, obj in enumerate(self.objects_list):
-            self.positions[i, :] = obj.position.vector
-            self.masses[i] = obj.mass
-            self.velocities[i, :] = obj.velocity.vector
+        # What the pairwise sums read, float32 copies refreshed by update_frame() or the state itself
+        if self.dtype == np.float32:
+            self.force_positions = np.zeros((self.N, 2), dtype=np.float32)
+            self.force_masses = np.zeros(self.N, dtype=np.float32)
+            self.force_softenings = None
+            self.frame_age = 0
+        else:
+            self.force_positions = self.positions
+            self.force_masses = self.masses
+            self.force_softenings = self.softenings
+
+        # Dense pairwise buffers are only needed by the direct sum
+        if self.backend == "direct" and self.dtype == np.float32:
+            self.pair_buffers = allocate_tile(self.N, self.N, np.float32)
+        elif self.backend == "direct":
+            self.displacements = np.zeros((self.N, self.N, 2))
+            self.dist_squared = np.zeros((self.N, self.N))
+            self.inv_dist_cubed = np.zeros((self.N, self.N))
+            self.accel_contributions = np.zeros((self.N, self.N, 2))
+        elif self.backend == "tiled":
+            # Each worker owns its buffers, so they split the budget
+            self.tile_size = self.requested_tile_size or tile_rows(self.N, self.memory_budget // self.workers, self.dtype)
+            # Make sure every worker gets at least one tile
+            self.tile_size = max(1, min(self.tile_size, -(-self.N // self.workers)))
+            self.tile_buffers = [
+                allocate_tile(min(self.tile_size, max(self.N, 1)), self.N, self.dtype)
+                for _ in range(self.workers)
+            ]
+        self.integrator.reset()
+        self.timestep.drop_forces()
+        if self.particles is not None:
+            self.particles.reset()
+
+    @classmethod
+    def from_preset(cls, preset, workers=1):
+        # Only the tiled backend can be split across threads
+        return cls(
+            preset.store,
+            backend=preset.backend,
+            theta=preset.theta,
+            memory_budget=preset.memory_budget,
+            workers=workers if preset.backend == "tiled" else 1,
+            integrator=preset.integrator,
+            dt=preset.dt,
+            timestep=preset.timestep,
+            tolerance=preset.tolerance,
+            collisions=preset.collisions,
+            softening=preset.softening,
+            kernel=preset.softening_kernel,
+            binaries=preset.binaries,
+            precision=preset.precision,
+            particles=preset.particles
+        )
+
+    def compute_accelerations(self, targets=None):
+        """
+        Refresh self.accelerations, only the rows in the index array targets when given
+        """
+        if self.dtype == np.float32:
+            self.update_frame()
+
+        if targets is not None:
+            self.target_accelerations(targets)
+        elif self.backend == "barnes_hut":
+            self.barnes_hut_accelerations()
+        elif self.backend == "tiled":
+            self.tiled_accelerations()
+        else:
+            self.direct_accelerations()
+
+        if self.dtype == np.float32:
+            self.accelerations[slice(None) if targets is None else targets] *= self.frame_scale
+        if self.pairs is not None:
+            self.pairs.remove_mutual(self)
+        return self.accelerations
+
+    def update_frame(self):
+        """
+        Fill the float32 force inputs: positions relative to the center of mass in units of the
+        RMS distance from it, masses in units of the largest. Distances stay near 1, far from
+        float32 under and overflow, and nearby bodies keep the digits absolute meters would lose.
+        The origin and units are refreshed every RECENTER_EVERY evaluations, the positions every time.
+        """
+        if self.frame_age % RECENTER_EVERY == 0:
+            total = self.masses.sum()
+            self.origin = self.masses @ self.positions / total if total > 0 else self.positions.mean(axis=0)
+            offsets = self.positions - self.origin
+            self.length = float(np.sqrt(np.einsum('ij,ij->', offsets, offsets) / max(self.N, 1))) or 1.0
+            mass_unit = float(self.masses.max(initial=0.0)) or 1.0
+            np.divide(self.masses, mass_unit, out=self.force_masses, casting="same_kind")
+            self.force_softenings = self.softenings / self.length if self.softenings is not None else None
+            # Accelerations come out in units of mass_unit / length^2
+            self.frame_scale = mass_unit / self.length**2
+        self.frame_age += 1
+
+        np.subtract(self.positions, self.origin, out=self.force_positions, casting="same_kind")
+        self.force_positions *= np.float32(1 / self.length)
+
+    def direct_accelerations(self):
+        if self.dtype == np.float32:
+            direct_sum_rows(
+                self.force_positions, self.force_masses, self.accelerations, 0, self.N, self.pair_buffers,
+                self.force_softenings, self.softening_kernel
+            )
+            return
 
         # Compute pairwise displacement vectors (r_j - r_i)
         np.subtract(self.positions[np.newaxis, :, :], self.positions[:, np.newaxis, :], out=self.displacements)
@@ -36,8 +393,8 @@ class PhysicsEngine:
         # Avoid division by zero by setting the diagonal to infinity
         np.fill_diagonal(self.dist_squared, np.inf)
 
-        # Compute inverse distances cubed
-        np.power(self.dist_squared, -1.5, out=self.inv_dist_cubed, where=self.dist_squared != np.inf)
+        # Compute inverse distances cubed, softened if asked
+        inverse_cube(self.dist_squared, pair_softening(self.softenings, slice(None)), self.softening_kernel, self.inv_dist_cubed)
 
         # Compute gravitational acceleration contributions
         # G * m_j * (r_j - r_i) / |r_j - r_i|^3
@@ -49,11 +406,180 @@ class PhysicsEngine:
         # Sum over all j to get the total acceleration on each object i
         np.sum(self.accel_contributions, axis=1, out=self.accelerations)
 
-        # Semi-implicit Euler integration
-        self.velocities += TIME_DELTA * self.accelerations
-        self.positions += TIME_DELTA * self.velocities
+    def tiled_accelerations(self):
+        if self.workers == 1:
+            self._tiled_rows(0)
+            return
+
+        # Workers write disjoint rows of self.accelerations, no reduction needed
+        pool = get_pool(self.workers)
+        for future in [pool.submit(self._tiled_rows, worker) for worker in range(self.workers)]:
+            future.result()
+
+    def _tiled_rows(self, worker):
+        # Tiles are dealt round robin so the workers stay balanced
+        buffers = self.tile_buffers[worker]
+        for start in range(worker * self.tile_size, self.N, self.workers * self.tile_size):
+            stop = min(start + self.tile_size, self.N)
+            direct_sum_rows(
+                self.force_positions, self.force_masses, self.accelerations, start, stop, buffers,
+                self.force_softenings, self.softening_kernel
+            )
+
+    def barnes_hut_accelerations(self):
+        # Tree is rebuilt every step, bodies move too much for a refit to pay off
+        tree = QuadTree(self.positions, self.masses, softenings=self.softenings, kernel=self.softening_kernel)
+        tree.accelerations(self.accelerations, self.theta)
+        self.accelerations *= G
+
+    def target_accelerations(self, targets):
+        if self.backend == "barnes_hut":
+            tree = QuadTree(self.positions, self.masses, softenings=self.softenings, kernel=self.softening_kernel)
+            tree.accelerations(self.accelerations, self.theta, bodies=targets)
+            self.accelerations[targets] *= G
+            return
+
+        if self.target_buffers is None:
+            self.target_buffers = allocate_tile(tile_rows(self.N, self.memory_budget, self.dtype), self.N, self.dtype)
+        rows = len(self.target_buffers[0])
+        for start in range(0, len(targets), rows):
+            direct_sum_targets(
+                self.force_positions, self.force_masses, self.accelerations, targets[start:start + rows],
+                self.target_buffers, self.force_softenings, self.softening_kernel
+            )
+
+    def acceleration_and_jerk(self, targets):
+        if self.backend == "barnes_hut":
+            # Jerk of the same tree nodes, the exact sum would cost O(N_targets * N) per step
+            tree = QuadTree(
+                self.positions, self.masses, softenings=self.softenings, kernel=self.softening_kernel,
+                velocities=self.velocities
+            )
+            accelerations = np.zeros((self.N, 2))
+            jerks = np.zeros((self.N, 2))
+            tree.accelerations(accelerations, self.theta, bodies=targets, jerks=jerks)
+            return G * accelerations[targets], G * jerks[targets]
+
+        return acceleration_and_jerk(
+            self.positions, self.velocities, self.masses, targets, self.memory_budget,
+            self.softenings, self.softening_kernel
+        )
+
+    def advance(self, interval: float):
+        """
+        Move the simulation forward by roughly interval seconds using the timestep mode.
+        Returns the simulated time actually covered, fixed steps carry the remainder over.
+        """
+        return self.timestep.advance(self, interval)
+
+    def invalidate(self):
+        """
+        Drop forces cached between steps, call after changing the state from outside
+        """
+        self.integrator.reset()
+        self.timestep.reset()
+        self.frame_age = 0
+        if self.particles is not None:
+            self.particles.reset()
+
+    def checkpoint(self):
+        checkpoint = self.store.checkpoint()
+        if self.particles is not None:
+            checkpoint.update(self.particles.checkpoint())
+        return checkpoint
+
+    def restore(self, checkpoint: dict):
+        if self.particles is not None and "particle_positions" in checkpoint:
+            self.particles.restore(checkpoint)
+        if len(checkpoint["masses"]) == self.N:
+            self.store.restore(checkpoint)
+            self.invalidate()
+            return
+
+        ids = checkpoint.get("ids", np.arange(len(checkpoint["masses"])))
+        planets = [self.planets_by_id[int(i)] for i in ids if int(i) in self.planets_by_id]
+        self.store.restore(checkpoint, planets)
+        self.bind_store()
+        self.invalidate()
+
+    def collide(self):
+        """
+        Merge overlapping bodies and compact the arrays, returns the number of bodies removed
+        """
+        if not self.collisions or self.N < 2:
+            return 0
+
+        first, second = collision_pairs(self.positions, self.store.radii)
+        if len(first) == 0:
+            return 0
+
+        keep = merge(self.store, first, second)
+        self.store.compact(keep)
+        self.bind_store()
+        return int(np.count_nonzero(~keep))
+
+    def save(self, path, time=0.0):
+        """
+        Write the state and the simulated time to an .npz file, missing folders are created.
+        A run killed mid-write keeps its previous file.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + ".partial")
+        with open(partial, "wb") as file:
+            np.savez(file, time=time, names=np.array([planet.name for planet in self.objects_list]), **self.checkpoint())
+        partial.replace(path)
+
+    def load(self, path):
+        """
+        Restore a state written by save, returns its simulated time
+        """
+        with np.load(path) as checkpoint:
+            self.restore({field: checkpoint[field] for field in checkpoint.files if field not in ("time", "names")})
+            return float(checkpoint["time"])
+
+    def update_objects(self, TIME_DELTA):
+        self.step_n(1, TIME_DELTA)
+
+    def step_n(self, n: int, dt: float):
+        """
+        Advance n substeps of dt without leaving the engine arrays.
+        Planets are views onto the store, so they see the result with no copy back.
+        """
+        for _ in range(n):
+            if self.binaries:
+                self.find_pairs(dt)
+            if self.particles is not None:
+                self.particles.begin(self, dt)
+            self.integrator.step(self, dt)
+            if self.particles is not None:
+                self.particles.end(self, dt)
+            self.steps += 1
+            self.collide()
+
+    def find_pairs(self, dt: float):
+        """
+        Pick the binaries to subcycle this step, forces cached for another set of pairs are dropped
+        """
+        pairs = Binaries.find(self, dt)
+        pairs = pairs if len(pairs) else None
+        if not Binaries.same(pairs, self.pairs):
+            self.integrator.reset()
+        self.pairs = pairs
+
+    def kick(self, dt: float):
+        self.velocities += dt * self.accelerations
+
+    def drift(self, dt: float):
+        if self.pairs is not None:
+            self.pairs.drift(self, dt)
+        else:
+            self.positions += dt * self.velocities
+
+    def kinetic_energy(self):
+        return 0.5 * np.einsum('i,ij,ij->', self.masses, self.velocities, self.velocities)
 
-        # Update the objects with new velocities and positions
-        for i, obj in enumerate(self.objects_list):
-            obj.velocity.vector[:] = self.velocities[i, :]
-            obj.position.vector[:] = self.positions[i, :]
+    def energy(self):
+        return self.kinetic_energy() + potential_energy(
+            self.positions, self.masses, self.memory_budget, self.softenings, self.softening_kernel
+        )
@@ -0,0 +1,183 @@
+"""
+Physics on its own thread, the window only reads published position snapshots.
+
+The engine runs at most `lead` simulated seconds past the time the window asked for,
+so a slow simulation holds the displayed time back instead of queueing work.
+"""
+
+import threading
+import time
+from collections import deque
+import numpy as np
+from physics import PhysicsEngine
+
+
+class PhysicsThread:
+    """
+    engine | PhysicsEngine to advance, nothing else may touch it while the thread runs
+    lead   | Simulated seconds the engine may run ahead of the displayed time, None for one engine dt
+    chunk  | Most simulated seconds handed to engine.advance at once, None for one engine dt.
+           | Every chunk is published and stop() waits for the current one at most.
+    depth  | Most snapshots kept, once full the newest is replaced so the engine never waits on the window
+
+    Every published chunk is queued as a (time, positions, particle positions) snapshot and
+    positions() interpolates the two around the requested time, so a frame covering several
+    chunks still shows the time it asked for. Snapshots older than that pair are recycled.
+    Steps are copied into a spare buffer outside the lock and only queued under it,
+    so neither side waits on the other for more than a queue update or one interpolation.
+    When bodies merge, a copy of the shrunk store is published with the positions,
+    the window draws from that copy and never reads the engine's store.
+    Test particles are published and interpolated the same way.
+    """
+    def __init__(self, engine: PhysicsEngine, lead=None, chunk=None, depth=32):
+        self.engine = engine
+        self.lead = lead if lead is not None else engine.dt
+        self.chunk = chunk if chunk is not None else engine.dt
+        self.depth = max(depth, 2)
+        self.snapshots = deque([(0.0, *self.copy_state())])
+        self.spares = []
+        self.bodies = engine.store.copy()
+        self.out = engine.positions.copy()
+        if engine.particles is not None:
+            self.particles_out = engine.particles.positions.copy()
+        self.latest_time = 0.0
+        # Simulated time the engine may run to, and how much of it was handed to advance
+        self.target = 0.0
+        self.requested = 0.0
+        self.error = None
+        # Wall seconds spent in engine.advance and engine steps taken, for the profiler
+        self.busy = 0.0
+        self.steps = 0
+        self.running = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="physics", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def request(self, time: float):
+        """
+        Let the engine run up to time plus the lead
+        """
+        with self.condition:
+            if time + self.lead > self.target:
+                self.target = time + self.lead
+                self.condition.notify()
+
+    def positions(self, time: float):
+        """
+        Positions at simulated time, interpolated between the snapshots around it.
+        Returns (time actually shown, positions, BodyStore the rows belong to), the time is
+        clamped to the newest snapshot when the engine is behind. The positions array
+        is reused by the next call.
+        """
+        with self.condition:
+            if self.error:
+                raise RuntimeError("physics thread stopped") from self.error
+
+            snapshots = self.snapshots
+            # Displayed time only moves forward, snapshots before the pair around it are done with
+            while len(snapshots) > 1 and snapshots[1][0] <= time:
+                self.spares.append(snapshots.popleft()[1:])
+
+            before = snapshots[0]
+            after = snapshots[1] if len(snapshots) > 1 else before
+            time = min(max(time, before[0]), after[0])
+            span = after[0] - before[0]
+            alpha = (time - before[0]) / span if span > 0 else 1.0
+
+            if self.out.shape != after[1].shape:
+                self.out = np.empty_like(after[1])
+            np.subtract(after[1], before[1], out=self.out)
+            self.out *= alpha
+            self.out += before[1]
+            if self.engine.particles is not None:
+                np.subtract(after[2], before[2], out=self.particles_out)
+                self.particles_out *= alpha
+                self.particles_out += before[2]
+            return time, self.out, self.bodies
+
+    def particles(self):
+        """
+        (positions, colors) of the test particles at the time of the last positions() call,
+        None when the engine has none. The positions array is reused like positions()'s.
+        """
+        if self.engine.particles is None:
+            return None
+        return self.particles_out, self.engine.particles.colors
+
+    def stats(self):
+        """
+        (seconds spent advancing the engine, engine steps taken), both running totals
+        """
+        with self.condition:
+            return self.busy, self.steps
+
+    def copy_state(self, spare=None):
+        """
+        (positions, particle positions) of the engine, copied into spare when its rows still match
+        """
+        positions, particles = spare if spare is not None else (np.empty_like(self.engine.positions), None)
+        np.copyto(positions, self.engine.positions)
+        if self.engine.particles is not None:
+            if particles is None:
+                particles = np.empty_like(self.engine.particles.positions)
+            np.copyto(particles, self.engine.particles.positions)
+        return positions, particles
+
+    def resize(self):
+        """
+        Bodies were merged away, drop their rows from the snapshots and publish the new store
+        """
+        bodies = self.engine.store.copy()
+        keep = np.isin(self.bodies.ids, bodies.ids)
+        with self.condition:
+            self.snapshots = deque(
+                (snapshot_time, positions[keep], particles) for snapshot_time, positions, particles in self.snapshots
+            )
+            self.spares = []
+            self.bodies = bodies
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while self.running and self.target <= self.requested:
+                        self.condition.wait()
+                    if not self.running:
+                        return
+                    begin = self.requested
+                    self.requested = min(self.target, self.requested + self.chunk)
+                    interval = self.requested - begin
+
+                start = time.perf_counter()
+                advanced = self.engine.advance(interval)
+                busy = time.perf_counter() - start
+                if advanced == 0.0:
+                    continue
+
+                if len(self.engine.store) != len(self.bodies):
+                    self.resize()
+                with self.condition:
+                    spare = self.spares.pop() if self.spares else None
+                state = self.copy_state(spare)
+                with self.condition:
+                    self.latest_time += advanced
+                    if len(self.snapshots) >= self.depth:
+                        self.spares.append(self.snapshots.pop()[1:])
+                    self.snapshots.append((self.latest_time, *state))
+                    self.busy += busy
+                    self.steps = self.engine.steps
+        except Exception as error:
+            with self.condition:
+                self.error = error
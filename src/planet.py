@@ -1,110 +1,135 @@
 from config import Config
+from assets import AssetManager
 from vector import Vector2D
-import pygame
+from bodies import BodyStore
+from typing import TYPE_CHECKING
+
+# Drawing lives in renderer.py, headless runs never import pygame
+if TYPE_CHECKING:
+    import pygame
 
 class Planet:
     """
-    name     | Name of planet object
-    asset    | AssetManger to load sprite or None
-    mass     | Mass of object in kg
-    radius   | Radius of object in meters
-    scale    | Sprite scale multiplier
-    color    | Tuple for color of text or circle if asset == None
-    position | Inital position on plane in meters
-    velocity | Inital velocity of planet in m/s
+    name      | Name of planet object
+    asset     | Name of a sprite in Config.Assets_Folder, a surface from AssetManager, or None for a circle
+    mass      | Mass of object in kg
+    radius    | Radius of object in meters
+    scale     | Sprite scale multiplier
+    color     | Tuple for color of text or circle if asset == None
+    position  | Inital position on plane in meters
+    velocity  | Inital velocity of planet in m/s
+    softening | Gravitational softening length in meters, 0 uses the preset's
+
+    The physical state lives in a row of a BodyStore, a fresh planet owns a one row store
+    until BodyStore.from_planets binds it into a system.
     """
     def __init__(
         self,
         name: str,
-        asset: pygame.Surface,
+        asset: "str | pygame.Surface",
         mass: float,
         radius: float,
         scale: int,
         color: tuple[int, int, int],
         position: Vector2D,
         velocity=Vector2D(),
+        softening=0.0,
     ):
         self.name = name
+        self.asset = asset
+        self.store = BodyStore(1)
+        self.index = 0
         self.mass = mass
         self.radius = radius
         self.scale = scale
-        self.asset = asset
         self.color = color
         self.position = position
         self.velocity = velocity
-        self.trajectory = []
-        self.trajectory_points = []
-        self.max_trajectory_points = 500
-
-    @staticmethod
-    def is_visible(planet_pos: Vector2D, planet_radius: float, screen_size):
-        screen_width, screen_height = screen_size
-        left = -planet_radius
-        right = screen_width + planet_radius
-        top = -planet_radius
-        bottom = screen_height + planet_radius
-        return (left <= planet_pos.x <= right) and (top <= planet_pos.y <= bottom)
-
-    def draw_trajectory(self, window, space_scale, camera_vector):
+        self.softening = softening
+
+    def bind(self, store: BodyStore, index: int):
+        self.store = store
+        self.index = index
+
+    def unbind(self):
         """
-        Draw trajectory only for visible planets and reset when going out of view.
+        Keep the current state in a one row store of its own, for a planet leaving its system
         """
-        # Get window dimensions for viewport check
-        window_width, window_height = window.get_size()
-        screen_pos = (self.position - camera_vector) * (1 / space_scale)
-        screen_pos.vector[1] = window_height - screen_pos.y
-
-        self.trajectory_points.append(self.position.copy())
-        if len(self.trajectory_points) > self.max_trajectory_points:
-            self.trajectory_points.pop(0)
-
-        # Draw trajectory
-        if len(self.trajectory_points) > 1:
-            points = []
-            for world_pos in self.trajectory_points:
-                screen_pos = (world_pos - camera_vector) * (1 / space_scale)
-                screen_pos.vector[1] = window_height - screen_pos.y
-                points.append(screen_pos.Args)
-
-            pygame.draw.lines(window, self.color, False, points, 1)
-
-    def draw(
-        self,
-        window: pygame.Surface,
-        space_scale: float,
-        camera_vector: Vector2D
-    ):
-        planet_radius = self.radius * self.scale / space_scale
-        planet_pos = (self.position - camera_vector) * (1 / space_scale)
-        planet_pos.vector[1] = window.get_height() - planet_pos.y
-
-        # self.trajectory.append(self.position.copy())
-        # if len(self.trajectory) > self.MAX_PATH_LENGTH:
-        #     del self.trajectory[0]
-
-        # # Prepare path points with y-coordinate inversion
-        # path_points = []
-        # for pos in self.trajectory:
-        #     traj_display_pos = (pos - camera_vector) * (1 / space_scale)
-        #     traj_display_pos.vector[1] = window.get_height() - traj_display_pos.y
-        #     path_points.append(traj_display_pos.Args)
-        # if len(path_points) > 1:
-        #     pygame.draw.lines(window, self.color, False, path_points, 1)
-        self.draw_trajectory(window, space_scale, camera_vector)
-
-        x, y = planet_pos.x, planet_pos.y
-
-        if Planet.is_visible(planet_pos, planet_radius, window.get_size()):
-            if self.asset:
-                image_size = int(2 * planet_radius)
-                scaled_image = pygame.transform.scale(self.asset, (image_size, image_size))
-                rect = scaled_image.get_rect(center=(int(x), int(y)))
-                window.blit(scaled_image, rect)
-            else:
-                pygame.draw.circle(window, self.color, (int(x), int(y)), int(planet_radius))
-
-            return planet_pos, planet_radius
+        store = BodyStore(1)
+        for field in BodyStore.FIELDS:
+            getattr(store, field)[0] = getattr(self.store, field)[self.index]
+        self.bind(store, 0)
+
+    @property
+    def asset(self):
+        """
+        Sprite surface, decoded on first use, None for a circle or in headless runs
+        """
+        if self.surface is not None:
+            return self.surface
+        return AssetManager().get_asset(self.asset_name)
+
+    @asset.setter
+    def asset(self, value: "str | pygame.Surface"):
+        # The name is kept so recordings and headless runs, where no sprite is loaded, still know it
+        if value is None or isinstance(value, str):
+            self.asset_name, self.surface = value, None
         else:
-            self.trajectory_points.clear()
+            self.asset_name = AssetManager().name_of(value)
+            self.surface = None if self.asset_name else value
+
+    @property
+    def position(self):
+        return Vector2D(*self.store.positions[self.index])
+
+    @position.setter
+    def position(self, value: Vector2D):
+        self.store.positions[self.index] = value.Args
+
+    @property
+    def velocity(self):
+        return Vector2D(*self.store.velocities[self.index])
+
+    @velocity.setter
+    def velocity(self, value: Vector2D):
+        self.store.velocities[self.index] = value.Args
+
+    @property
+    def mass(self):
+        return self.store.masses[self.index]
+
+    @mass.setter
+    def mass(self, value: float):
+        self.store.masses[self.index] = value
+
+    @property
+    def radius(self):
+        return self.store.radii[self.index]
+
+    @radius.setter
+    def radius(self, value: float):
+        self.store.radii[self.index] = value
+
+    @property
+    def scale(self):
+        return self.store.scales[self.index]
+
+    @scale.setter
+    def scale(self, value: int):
+        self.store.scales[self.index] = value
+
+    @property
+    def softening(self):
+        return self.store.softenings[self.index]
+
+    @softening.setter
+    def softening(self, value: float):
+        self.store.softenings[self.index] = value
+
+    @property
+    def color(self):
+        return tuple(int(c) for c in self.store.colors[self.index])
 
-        return None, None
+    @color.setter
+    def color(self, value: tuple[int, int, int]):
+        self.store.colors[self.index] = value
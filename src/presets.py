@@ -1,227 +1,376 @@
+import json
+import tomllib
+from functools import partial
+from pathlib import Path
 from planet import Planet
-from assets import AssetManager
+from bodies import BodyStore
 from vector import Vector2D
+from config import Config
+from catalogs import read_table
+from generators import generate
+from particles import TestParticles
 
 class Preset:
     """
-    name        | Name of preset button on screen
-    objects     | List of Planet objects to simulate
-    space_scale | Pixel to meter conversion, increase to make one pixel cover more physical space
-    dt          | Simulation delta time, for large simulation increase for FPS stability
+    name             | Name of preset button on screen
+    objects          | List of Planet objects to simulate, bound to the preset's BodyStore
+    space_scale      | Pixel to meter conversion, increase to make one pixel cover more physical space
+    dt               | Simulation delta time, for large simulation increase for FPS stability
+    backend          | Gravity solver, "direct" (exact), "tiled" (exact, bounded memory) or "barnes_hut" (approximate, for large N)
+    theta            | Barnes-Hut opening angle, only used by the "barnes_hut" backend
+    memory_budget    | Bytes of pairwise buffers the "tiled" backend may allocate
+    integrator       | Time stepping scheme, "euler", "leapfrog", "yoshida4" or "rk4", see integrators.py
+    timestep         | "fixed" steps of dt, or "adaptive"/"hierarchical" steps of at most dt, see timesteps.py
+    tolerance        | Accuracy of the adaptive modes, smaller takes smaller steps
+    collisions       | Merge bodies that touch, conserving mass and momentum
+    softening        | Gravitational softening length in meters for bodies without their own, see softening.py
+    softening_kernel | "plummer" or "spline"
+    binaries         | Subcycle hard binaries so the rest of the system keeps a large dt, see binaries.py
+    precision        | "float64", or "float32" force sums for large "direct"/"tiled" runs, positions stay float64
+    bodies           | BodyStore of extra bodies without Planet objects, placed after objects
+    particles        | TestParticles, massless dust moved by the bodies' gravity, see particles.py
     """
+    OPTIONS = (
+        "backend", "theta", "memory_budget", "integrator", "timestep", "tolerance", "collisions",
+        "softening", "softening_kernel", "binaries", "precision"
+    )
+
     def __init__(
         self,
         name: str,
         objects: list,
         space_scale: int,
-        dt: int
+        dt: int,
+        backend: str = "direct",
+        theta: float = 0.5,
+        memory_budget: int = 64 * 2**20,
+        integrator: str = "leapfrog",
+        timestep: str = "fixed",
+        tolerance: float = 0.02,
+        collisions: bool = False,
+        softening: float = 0.0,
+        softening_kernel: str = "plummer",
+        binaries: bool = False,
+        precision: str = "float64",
+        bodies: BodyStore = None,
+        particles: TestParticles = None
     ):
         self.name = name
         self.objects = objects
+        self.store = BodyStore.from_planets(objects)
+        if bodies is not None:
+            self.store = BodyStore.concatenate([self.store, bodies])
+        self.particles = particles
+        self.initial = self.store.checkpoint()
+        if particles is not None:
+            self.initial.update(particles.checkpoint())
         self.space_scale = space_scale
         self.dt = dt
+        self.backend = backend
+        self.theta = theta
+        self.memory_budget = memory_budget
+        self.integrator = integrator
+        self.timestep = timestep
+        self.tolerance = tolerance
+        self.collisions = collisions
+        self.softening = softening
+        self.softening_kernel = softening_kernel
+        self.binaries = binaries
+        self.precision = precision
 
     def reset(self):
-        for object in self.objects:
-            object.trajectory_points = []
+        """
+        Put every body back where the preset started, merged bodies included
+        """
+        self.store.restore(self.initial, self.objects)
+        if self.particles is not None:
+            self.particles.restore(self.initial)
 
-def get_presets():
-    return [
-        ### Earth and Moon
-        Preset(
-            name="Earth & Moon",
-            objects=[
-                Planet(
-                    name="Earth",
-                    asset=AssetManager().get_asset("Earth"),
-                    mass=5.9724 * 10**24,
-                    radius=6.356 * 10**6,
-                    scale=5,
-                    color=(11, 227, 195),
-                    position=Vector2D(5 * 10**8, 5 * 10**8),
-                    velocity=Vector2D(0,0)
-                ),
-                Planet(
-                    name="Moon",
-                    asset=AssetManager().get_asset("Moon"),
-                    mass=7.34767309e22,
-                    radius=1.7371e6,
-                    scale=3,
-                    color=(180, 180, 180),
-                    position=Vector2D(
-                        8.992 * 10 ** 8, 5 * 10 ** 8,
-                    ),
-                    velocity=Vector2D(
-                        0, 1022
-                    )
-                ),
-            ],
-            dt=100,
-            space_scale=10**6 + 1000
-        ),
-
-        ### Binary Stars
-        Preset(
-            name="Binary",
-            objects=[
-                Planet(
-                    name="Binary 0",
-                    asset=AssetManager().get_asset("Jupiter"),
-                    mass=5.972 * 10 ** 24,
-                    radius=6.371 * 10 ** 6,
-                    scale=1,
-                    color=(255, 255, 255),
-                    position=Vector2D(3 * 10 ** 8, 5 * 10 ** 8),
-                    velocity=Vector2D(0, 600)
+class LazyPreset:
+    """
+    name  | Name of preset button on screen
+    build | Function returning the Preset, only called on the first load()
+
+    Registering a preset costs nothing until it is picked, so the library can grow
+    without slowing startup or decoding sprites nobody looks at.
+    """
+    def __init__(self, name: str, build):
+        self.name = name
+        self.build = build
+        self.preset = None
+
+    def load(self):
+        if self.preset is None:
+            self.preset = self.build()
+        return self.preset
+
+def earth_and_moon():
+    return Preset(
+        name="Earth & Moon",
+        objects=[
+            Planet(
+                name="Earth",
+                asset="Earth",
+                mass=5.9724 * 10**24,
+                radius=6.356 * 10**6,
+                scale=5,
+                color=(11, 227, 195),
+                position=Vector2D(5 * 10**8, 5 * 10**8),
+                velocity=Vector2D(0,0)
+            ),
+            Planet(
+                name="Moon",
+                asset="Moon",
+                mass=7.34767309e22,
+                radius=1.7371e6,
+                scale=3,
+                color=(180, 180, 180),
+                position=Vector2D(
+                    8.992 * 10 ** 8, 5 * 10 ** 8,
                 ),
-                Planet(
-                    name="Binary 1",
-                    asset=AssetManager().get_asset("Jupiter"),
-                    mass=5.972 * 10 ** 24,
-                    radius=6.371 * 10 ** 6,
-                    scale=1,
-                    color=(255, 255, 255),
-                    position=Vector2D(7 * 10 ** 8, 5 * 10 ** 8),
-                    velocity=Vector2D(0, -600)
+                velocity=Vector2D(
+                    0, 1022
                 )
-            ],
-            dt=100,
-            space_scale=10**6
-        ),
-
-        ### Solar System
-        Preset(
-            name="Solar System",
-            objects=[
-                Planet(
-                    name="Sun",
-                    asset=None,
-                    # asset=AssetManager().get_asset("Jupiter"),
-                    mass=1.989 * 10**30,
-                    radius=6.957 * 10**8,
-                    scale=25,
-                    color=(252, 186, 3),
-                    position=Vector2D(6 * 10**12, 6 * 10**12),
-                    velocity=Vector2D(0, 0)
-                ),
+            ),
+        ],
+        dt=100,
+        space_scale=10**6 + 1000
+    )
 
-                Planet(
-                    name="Mecury",
-                    asset=None,
-                    mass=3.285 * 10**23,
-                    radius=2.4397 * 10**6,
-                    scale=1000,
-                    color=(180, 180, 180),
-                    position=Vector2D(6 * 10**12 + 57.9 * 10**9, 6 * 10**12),
-                    velocity=Vector2D(0, 47.36 * 10**3)
-                ),
+def binary_stars():
+    return Preset(
+        name="Binary",
+        objects=[
+            Planet(
+                name="Binary 0",
+                asset="Jupiter",
+                mass=5.972 * 10 ** 24,
+                radius=6.371 * 10 ** 6,
+                scale=1,
+                color=(255, 255, 255),
+                position=Vector2D(3 * 10 ** 8, 5 * 10 ** 8),
+                velocity=Vector2D(0, 600)
+            ),
+            Planet(
+                name="Binary 1",
+                asset="Jupiter",
+                mass=5.972 * 10 ** 24,
+                radius=6.371 * 10 ** 6,
+                scale=1,
+                color=(255, 255, 255),
+                position=Vector2D(7 * 10 ** 8, 5 * 10 ** 8),
+                velocity=Vector2D(0, -600)
+            )
+        ],
+        dt=100,
+        space_scale=10**6
+    )
 
-                Planet(
-                    name="Venus",
-                    asset=None,
-                    mass=4.867 * 10**24,
-                    radius=6.0518 * 10**6,
-                    scale=1000,
-                    color=(187, 183, 171),
-                    position=Vector2D(6 * 10**12 - 107.48 * 10**9, 6 * 10**12),
-                    velocity=Vector2D(0, -35.02 * 10**3)
-                ),
+def solar_system():
+    return Preset(
+        name="Solar System",
+        objects=[
+            Planet(
+                name="Sun",
+                asset=None,
+                # asset="Jupiter",
+                mass=1.989 * 10**30,
+                radius=6.957 * 10**8,
+                scale=25,
+                color=(252, 186, 3),
+                position=Vector2D(6 * 10**12, 6 * 10**12),
+                velocity=Vector2D(0, 0)
+            ),
 
-                Planet(
-                    name="Earth",
-                    asset=AssetManager().get_asset("Earth"),
-                    mass=5.9724 * 10**24,
-                    radius=6.356 * 10**6,
-                    scale=3,
-                    color=(11, 227, 195),
-                    position=Vector2D(6 * 10**12 + 151.96 * 10**9, 6 * 10**12),
-                    velocity=Vector2D(0, 29.78 * 10**3)
-                ),
+            Planet(
+                name="Mecury",
+                asset=None,
+                mass=3.285 * 10**23,
+                radius=2.4397 * 10**6,
+                scale=1000,
+                color=(180, 180, 180),
+                position=Vector2D(6 * 10**12 + 57.9 * 10**9, 6 * 10**12),
+                velocity=Vector2D(0, 47.36 * 10**3)
+            ),
 
-                Planet(
-                    name="Moon",
-                    asset=AssetManager().get_asset("Moon"),
-                    mass=7.34767309e22,
-                    radius=1.7371e6,
-                    scale=3,
-                    color=(180, 180, 180),
-                    position=Vector2D(
-                        6 * 10**12 + 151.96 * 10**9 + 384400 * 10**3,
-                        6 * 10**12
-                    ),
-                    velocity=Vector2D(
-                        0,
-                        29.78 * 10**3 + 1.022 * 10**3
-                    )
-                ),
+            Planet(
+                name="Venus",
+                asset=None,
+                mass=4.867 * 10**24,
+                radius=6.0518 * 10**6,
+                scale=1000,
+                color=(187, 183, 171),
+                position=Vector2D(6 * 10**12 - 107.48 * 10**9, 6 * 10**12),
+                velocity=Vector2D(0, -35.02 * 10**3)
+            ),
 
-                Planet(
-                    name="Mars",
-                    asset=AssetManager().get_asset("Mars"),
-                    mass=64171 * 10**23,
-                    radius=3.3895 * 10**6,
-                    scale=1000,
-                    color=(193, 68, 14),
-                    position=Vector2D(6 * 10**12 - 250.17 * 10**9, 6 * 10**12),
-                    velocity=Vector2D(0, -24.07 * 10**3)
-                ),
+            Planet(
+                name="Earth",
+                asset="Earth",
+                mass=5.9724 * 10**24,
+                radius=6.356 * 10**6,
+                scale=3,
+                color=(11, 227, 195),
+                position=Vector2D(6 * 10**12 + 151.96 * 10**9, 6 * 10**12),
+                velocity=Vector2D(0, 29.78 * 10**3)
+            ),
 
-                Planet(
-                    name="Jupiter",
-                    asset=AssetManager().get_asset("Jupiter"),
-                    mass=1.89819 * 10**27,
-                    radius=6.9911 * 10**7,
-                    scale=200,
-                    color=(211, 156, 126),
-                    position=Vector2D(6 * 10**12 + 754.87 * 10**9, 6 * 10**12),
-                    velocity=Vector2D(0, 13.06 * 10**3)
+            Planet(
+                name="Moon",
+                asset="Moon",
+                mass=7.34767309e22,
+                radius=1.7371e6,
+                scale=3,
+                color=(180, 180, 180),
+                position=Vector2D(
+                    6 * 10**12 + 151.96 * 10**9 + 384400 * 10**3,
+                    6 * 10**12
                 ),
+                velocity=Vector2D(
+                    0,
+                    29.78 * 10**3 + 1.022 * 10**3
+                )
+            ),
 
-                Planet(
-                    name="Saturn",
-                    asset=None,
-                    mass=5.6834 * 10**26,
-                    radius=5.4364 * 10**7,
-                    scale=200,
-                    color=(197, 171, 110),
-                    position=Vector2D(6 * 10 ** 12 - 1.4872 * 10**12, 6 * 10 ** 12),
-                    velocity=Vector2D(0, -9.68 * 10**3)
-                ),
+            Planet(
+                name="Mars",
+                asset="Mars",
+                mass=64171 * 10**23,
+                radius=3.3895 * 10**6,
+                scale=1000,
+                color=(193, 68, 14),
+                position=Vector2D(6 * 10**12 - 250.17 * 10**9, 6 * 10**12),
+                velocity=Vector2D(0, -24.07 * 10**3)
+            ),
 
-                Planet(
-                    name="Uranus",
-                    asset=None,
-                    mass=8.6813 * 10**25,
-                    radius=2.4973 * 10**7,
-                    scale=600,
-                    color=(187, 225, 228),
-                    position=Vector2D(6 * 10 ** 12 + 2.9541 * 10**12, 6 * 10 ** 12),
-                    velocity=Vector2D(0, 6.80 * 10**3)
-                ),
+            Planet(
+                name="Jupiter",
+                asset="Jupiter",
+                mass=1.89819 * 10**27,
+                radius=6.9911 * 10**7,
+                scale=200,
+                color=(211, 156, 126),
+                position=Vector2D(6 * 10**12 + 754.87 * 10**9, 6 * 10**12),
+                velocity=Vector2D(0, 13.06 * 10**3)
+            ),
 
-                Planet(
-                    name="Neptune",
-                    asset=None,
-                    mass=1.02413 * 10**26,
-                    radius=2.4341 * 10**7,
-                    scale=600,
-                    color=(62, 84, 232),
-                    position=Vector2D(6 * 10 ** 12 - 4.495 * 10**12, 6 * 10 ** 12),
-                    velocity=Vector2D(0, -5.43 * 10**3)
-                ),
+            Planet(
+                name="Saturn",
+                asset=None,
+                mass=5.6834 * 10**26,
+                radius=5.4364 * 10**7,
+                scale=200,
+                color=(197, 171, 110),
+                position=Vector2D(6 * 10 ** 12 - 1.4872 * 10**12, 6 * 10 ** 12),
+                velocity=Vector2D(0, -9.68 * 10**3)
+            ),
 
-                Planet(
-                    name="Pluto",
-                    asset=None,
-                    mass=1.303 * 10**22,
-                    radius=1.188 * 10**6,
-                    scale=1000,
-                    color=(150, 133, 112),
-                    position=Vector2D(6 * 10 ** 12 + 5.90538 * 10**12, 6 * 10 ** 12),
-                    velocity=Vector2D(0, 4.67 * 10**3)
-                )
-            ],
-            dt=5000,
-            space_scale=12 * 10 ** 9
+            Planet(
+                name="Uranus",
+                asset=None,
+                mass=8.6813 * 10**25,
+                radius=2.4973 * 10**7,
+                scale=600,
+                color=(187, 225, 228),
+                position=Vector2D(6 * 10 ** 12 + 2.9541 * 10**12, 6 * 10 ** 12),
+                velocity=Vector2D(0, 6.80 * 10**3)
+            ),
+
+            Planet(
+                name="Neptune",
+                asset=None,
+                mass=1.02413 * 10**26,
+                radius=2.4341 * 10**7,
+                scale=600,
+                color=(62, 84, 232),
+                position=Vector2D(6 * 10 ** 12 - 4.495 * 10**12, 6 * 10 ** 12),
+                velocity=Vector2D(0, -5.43 * 10**3)
+            ),
+
+            Planet(
+                name="Pluto",
+                asset=None,
+                mass=1.303 * 10**22,
+                radius=1.188 * 10**6,
+                scale=1000,
+                color=(150, 133, 112),
+                position=Vector2D(6 * 10 ** 12 + 5.90538 * 10**12, 6 * 10 ** 12),
+                velocity=Vector2D(0, 4.67 * 10**3)
+            )
+        ],
+        dt=5000,
+        space_scale=12 * 10 ** 9
+    )
+
+def read_settings(path: Path):
+    if path.suffix == ".toml":
+        with open(path, "rb") as file:
+            return tomllib.load(file)
+    with open(path) as file:
+        return json.load(file)
+
+def load_preset_file(path):
+    """
+    Preset from a .toml or .json file, see the files in Config.Presets_Folder for the layout.
+    A file without a "name" is named after its file stem.
+
+    bodies     | Named bodies, each becomes a Planet with a label and optional sprite
+    tables     | Body tables read by catalogs.read_table, "file" is relative to the preset file
+    generators | Procedural bodies, "kind" names a function in generators.py and the rest are its arguments
+    particles  | Massless test particles, each entry a table ("file") or a generator ("kind") as above,
+               | only the positions, velocities and colors are kept
+    """
+    path = Path(path)
+    settings = read_settings(path)
+
+    objects = [
+        Planet(
+            name=body["name"],
+            asset=body.get("asset"),
+            mass=body["mass"],
+            radius=body["radius"],
+            scale=body.get("scale", 1),
+            color=tuple(body.get("color", (255, 255, 255))),
+            position=Vector2D(*body["position"]),
+            velocity=Vector2D(*body.get("velocity", (0.0, 0.0))),
+            softening=body.get("softening", 0.0)
         )
+        for body in settings.get("bodies", [])
+    ]
+
+    def build(entry):
+        entry = dict(entry)
+        if "file" in entry:
+            return read_table(path.parent / entry.pop("file"), **entry)
+        return generate(**entry)
+
+    parts = [build(entry) for entry in settings.get("tables", []) + settings.get("generators", [])]
+    clouds = [build(entry) for entry in settings.get("particles", [])]
+
+    return Preset(
+        settings.get("name", path.stem),
+        objects,
+        settings["space_scale"],
+        settings["dt"],
+        bodies=BodyStore.concatenate(parts) if parts else None,
+        particles=TestParticles.from_store(BodyStore.concatenate(clouds)) if clouds else None,
+        **{option: settings[option] for option in Preset.OPTIONS if option in settings}
+    )
+
+def preset_files(folder):
+    """
+    LazyPreset for every .toml and .json file in folder, only the settings are read up front
+    """
+    return [
+        LazyPreset(read_settings(path).get("name", path.stem), partial(load_preset_file, path))
+        for path in sorted(Path(folder).glob("*"))
+        if path.suffix in (".toml", ".json")
+    ]
+
+def get_presets():
+    return [
+        LazyPreset("Earth & Moon", earth_and_moon),
+        LazyPreset("Binary", binary_stars),
+        LazyPreset("Solar System", solar_system),
+        *preset_files(Config.Presets_Folder),
     ]
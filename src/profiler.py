@@ -0,0 +1,144 @@
+"""
+Per phase timings of the window loop, kept for the last few seconds of frames.
+
+    profiler.begin()          # top of every frame, closes the previous one
+    ...
+    profiler.mark("render")   # time since the previous mark is charged to "render"
+
+While disabled every call returns at once, so the calls stay in the loop for good.
+The time between the last mark of a frame and the next begin() is "idle", mostly
+clock.tick() waiting for the frame cap, so the phases of a frame add up to its total.
+"""
+
+import csv
+import json
+import time
+import numpy as np
+
+PHASES = ("events", "background", "physics", "render", "buttons", "ui", "hud", "display", "idle")
+# engine   | Seconds the physics thread spent in engine.advance during the frame
+# steps    | Engine steps taken during the frame
+# wanted   | Simulated seconds the time scale asked for this frame
+# advanced | Simulated seconds actually shown, less than wanted when the physics falls behind
+COUNTERS = ("engine", "steps", "wanted", "advanced")
+COLUMNS = PHASES + ("total",) + COUNTERS
+# Exported columns, wall times in ms
+TIMED = PHASES + ("total", "engine")
+EXPORT_COLUMNS = tuple(f"{name}_ms" for name in TIMED) + COUNTERS[1:]
+
+
+class FrameProfiler:
+    """
+    frames  | Frames kept for the rolling statistics and exports
+    enabled | Record from the start, otherwise toggle() turns it on
+    """
+    def __init__(self, frames=600, enabled=False):
+        self.samples = np.zeros((frames, len(COLUMNS)))
+        self.columns = {name: i for i, name in enumerate(COLUMNS)}
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.samples.fill(0.0)
+        # Frames recorded so far, the row being filled is count % len(samples)
+        self.count = 0
+        self.frame_start = None
+        self.last = None
+        self.engine = None
+        self.steps = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.reset()
+
+    @property
+    def row(self):
+        return self.samples[self.count % len(self.samples)]
+
+    def begin(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            row = self.row
+            row[self.columns["idle"]] += now - self.last
+            row[self.columns["total"]] = now - self.frame_start
+            self.count += 1
+            self.row.fill(0.0)
+        self.frame_start = self.last = now
+
+    def mark(self, phase: str):
+        if not self.enabled or self.last is None:
+            return
+        now = time.perf_counter()
+        self.row[self.columns[phase]] += now - self.last
+        self.last = now
+
+    def physics(self, engine_time: float, steps: int, wanted: float, advanced: float):
+        """
+        Record the physics counters of this frame. engine_time and steps are running totals,
+        they start again from zero when a preset is loaded.
+        """
+        if not self.enabled or self.last is None:
+            return
+        row = self.row
+        if self.engine is not None:
+            restarted = engine_time < self.engine or steps < self.steps
+            row[self.columns["engine"]] = engine_time - (0.0 if restarted else self.engine)
+            row[self.columns["steps"]] = steps - (0 if restarted else self.steps)
+        self.engine, self.steps = engine_time, steps
+        row[self.columns["wanted"]] = wanted
+        row[self.columns["advanced"]] = advanced
+
+    def history(self):
+        """
+        Finished frames, oldest first, one row of COLUMNS each
+        """
+        frames = len(self.samples)
+        if self.count <= frames:
+            return self.samples[:self.count].copy()
+        start = self.count % frames
+        return np.concatenate((self.samples[start:], self.samples[:start]))
+
+    def summary(self):
+        """
+        Mean, 95th percentile and max of every phase in ms, with the per frame physics counters
+        """
+        history = self.history()
+        if len(history) == 0:
+            return {}
+        summary = {"frames": len(history)}
+        for name in PHASES + ("total",):
+            column = history[:, self.columns[name]] * 1000
+            summary[name] = {
+                "mean_ms": float(column.mean()),
+                "p95_ms": float(np.percentile(column, 95)),
+                "max_ms": float(column.max()),
+            }
+        summary["engine_ms"] = float(history[:, self.columns["engine"]].mean() * 1000)
+        summary["steps_per_frame"] = float(history[:, self.columns["steps"]].mean())
+        wanted = history[:, self.columns["wanted"]].sum()
+        summary["speed"] = float(history[:, self.columns["advanced"]].sum() / wanted) if wanted > 0 else 1.0
+        return summary
+
+    def export_rows(self):
+        """
+        history() with the wall times in ms, columns as EXPORT_COLUMNS
+        """
+        history = self.history()
+        history[:, :len(TIMED)] *= 1000
+        return history.tolist()
+
+    def to_csv(self, path):
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(EXPORT_COLUMNS)
+            writer.writerows(self.export_rows())
+
+    def to_json(self, path):
+        with open(path, "w") as file:
+            json.dump({
+                "summary": self.summary(),
+                "columns": EXPORT_COLUMNS,
+                "frames": self.export_rows(),
+            }, file, indent=1)
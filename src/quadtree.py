@@ -0,0 +1,235 @@
+"""
+Barnes-Hut quadtree built from flat position/mass arrays.
+
+Bodies are sorted along a Morton (Z-order) curve so every tree node is a
+contiguous run of the sorted bodies. The tree walk is done for all bodies at
+once, one level at a time, with numpy arrays of (body, node) pairs instead of
+recursion.
+"""
+
+import numpy as np
+from softening import inverse_cube, inverse_cube_and_slope
+
+# 4**16 cells per side is far below float64 resolution for any preset
+MAX_DEPTH = 16
+
+
+def _spread_bits(values):
+    values = values.astype(np.uint64)
+    values = (values | (values << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    values = (values | (values << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    values = (values | (values << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    values = (values | (values << np.uint64(2))) & np.uint64(0x3333333333333333)
+    values = (values | (values << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return values
+
+
+def morton_codes(positions, max_depth=MAX_DEPTH):
+    """
+    Z-order key of every position inside its bounding square.
+    Returns (codes, origin, size) where size is the side of the root cell.
+    """
+    origin = positions.min(axis=0)
+    size = float((positions.max(axis=0) - origin).max())
+    if size <= 0.0:
+        size = 1.0
+    # Pad so the maximum coordinate still lands in the last cell
+    size *= 1.0 + 1e-9
+
+    cells_per_side = 1 << max_depth
+    cells = ((positions - origin) * (cells_per_side / size)).astype(np.int64)
+    np.clip(cells, 0, cells_per_side - 1, out=cells)
+
+    codes = _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << np.uint64(1))
+    return codes, origin, size
+
+
+class _Level:
+    """
+    All nodes of one tree depth.
+
+    starts / counts | Slice of the sorted bodies owned by each node
+    mass / com      | Total mass and center of mass of each node
+    velocity        | Velocity of the center of mass of each node, None unless the tree has velocities
+    softening       | Largest eps of the bodies in each node, None unless eps differs per body
+    body_node       | Node index of every body, in original body order
+    size            | Side length of the cells at this depth
+    """
+    def __init__(self, starts, counts, mass, com, body_node, size, softening=None, velocity=None):
+        self.starts = starts
+        self.counts = counts
+        self.mass = mass
+        self.com = com
+        self.velocity = velocity
+        self.body_node = body_node
+        self.size = size
+        self.softening = softening
+        self.child_lo = None
+        self.child_hi = None
+
+
+class QuadTree:
+    """
+    softenings | None, one eps for every body or an (N,) array, see softening.py.
+               | A node is softened by the larger of the body's eps and the largest in the node.
+    kernel     | Softening kernel, "plummer" or "spline"
+    velocities | (N, 2) velocities, only needed for the jerk
+    """
+    def __init__(self, positions: np.ndarray, masses: np.ndarray, max_depth=MAX_DEPTH, softenings=None, kernel="plummer", velocities=None):
+        self.positions = positions
+        self.masses = masses
+        self.velocities = velocities
+        self.softenings = softenings
+        self.kernel = kernel
+        self.N = len(positions)
+        self.levels = []
+
+        if self.N == 0:
+            return
+
+        codes, _, root_size = morton_codes(positions, max_depth)
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        sorted_positions = positions[order]
+        sorted_masses = masses[order]
+        per_body = np.ndim(softenings) == 1
+        if per_body:
+            sorted_softenings = softenings[order]
+        weighted = sorted_positions * sorted_masses[:, np.newaxis]
+        if velocities is not None:
+            sorted_velocities = velocities[order]
+            momenta = sorted_velocities * sorted_masses[:, np.newaxis]
+
+        for depth in range(max_depth + 1):
+            keys = sorted_codes >> np.uint64(2 * (max_depth - depth))
+            new_node = np.empty(self.N, dtype=bool)
+            new_node[0] = True
+            np.not_equal(keys[1:], keys[:-1], out=new_node[1:])
+
+            starts = np.flatnonzero(new_node)
+            counts = np.diff(np.append(starts, self.N))
+            mass = np.add.reduceat(sorted_masses, starts)
+            moment = np.add.reduceat(weighted, starts, axis=0)
+            centroid = np.add.reduceat(sorted_positions, starts, axis=0) / counts[:, np.newaxis]
+
+            # Massless nodes have no center of mass, their centroid is harmless
+            com = centroid
+            has_mass = mass > 0
+            com[has_mass] = moment[has_mass] / mass[has_mass, np.newaxis]
+
+            velocity = None
+            if velocities is not None:
+                velocity = np.add.reduceat(sorted_velocities, starts, axis=0) / counts[:, np.newaxis]
+                velocity[has_mass] = np.add.reduceat(momenta, starts, axis=0)[has_mass] / mass[has_mass, np.newaxis]
+
+            body_node = np.empty(self.N, dtype=np.int64)
+            body_node[order] = np.cumsum(new_node) - 1
+
+            self.levels.append(_Level(
+                starts, counts, mass, com, body_node, root_size / (1 << depth),
+                np.maximum.reduceat(sorted_softenings, starts) if per_body else None, velocity
+            ))
+
+            # Every node is a single body, nothing left to subdivide
+            if len(starts) == self.N:
+                break
+
+        for parent, child in zip(self.levels[:-1], self.levels[1:]):
+            parent.child_lo = np.searchsorted(child.starts, parent.starts)
+            parent.child_hi = np.searchsorted(child.starts, parent.starts + parent.counts)
+
+    def accelerations(self, out: np.ndarray, theta=0.5, bodies=None, jerks=None):
+        """
+        Write the acceleration of every body into out (N, 2), with G = 1.
+        A node is used as a single point mass when size / distance < theta.
+        bodies limits the walk to an index array of bodies, other rows of out are left alone.
+        jerks (N, 2) also gets da/dt of the same point masses, the tree must have velocities.
+        """
+        body = np.arange(self.N) if bodies is None else np.asarray(bodies)
+        out[body] = 0.0
+        if jerks is not None:
+            jerks[body] = 0.0
+        if self.N < 2:
+            return out
+
+        theta_squared = theta * theta
+        node = np.zeros(len(body), dtype=np.int64)
+        last = len(self.levels) - 1
+
+        for depth, level in enumerate(self.levels):
+            displacement = level.com[node] - self.positions[body]
+            dist_squared = np.einsum('ij,ij->i', displacement, displacement)
+            counts = level.counts[node]
+
+            inside = level.body_node[body] == node
+            leaf = (counts == 1) | (depth == last)
+            far = ~inside & (level.size * level.size < theta_squared * dist_squared)
+            use = far | (leaf & ~inside)
+
+            self._accumulate(
+                out, body[use], displacement[use], dist_squared[use], level.mass[node[use]],
+                self._softening(level, body[use], node[use]),
+                jerks, None if jerks is None else level.velocity[node[use]]
+            )
+
+            # Bodies sharing a cell at the deepest level: use the cell without itself
+            shared = leaf & inside & (counts > 1)
+            if shared.any():
+                self._accumulate_without_self(out, body[shared], level, node[shared], jerks)
+
+            expand = ~use & ~leaf
+            if depth == last or not expand.any():
+                break
+            body, node = self._children(level, body[expand], node[expand])
+
+        return out
+
+    @staticmethod
+    def _children(level, body, node):
+        lo = level.child_lo[node]
+        n_children = level.child_hi[node] - lo
+        total = int(n_children.sum())
+
+        first = np.cumsum(n_children) - n_children
+        offsets = np.arange(total) - np.repeat(first, n_children)
+        return np.repeat(body, n_children), np.repeat(lo, n_children) + offsets
+
+    def _softening(self, level, body, node):
+        if level.softening is None:
+            return self.softenings
+        return np.maximum(self.softenings[body], level.softening[node])
+
+    def _accumulate(self, out, body, displacement, dist_squared, mass, softening, jerks=None, velocity=None):
+        # m_node * (r_node - r_i) / |r_node - r_i|^3
+        if jerks is None:
+            factor = np.zeros_like(dist_squared)
+            inverse_cube(dist_squared, softening, self.kernel, factor)
+        else:
+            factor, slope = inverse_cube_and_slope(dist_squared, softening, self.kernel)
+            # m_node * (f * v + g * (r . v) * r) with v the node's velocity relative to the body
+            relative_velocity = velocity - self.velocities[body]
+            slope *= mass * np.einsum('ij,ij->i', displacement, relative_velocity)
+            jerk = (factor * mass)[:, np.newaxis] * relative_velocity + slope[:, np.newaxis] * displacement
+            jerks[:, 0] += np.bincount(body, weights=jerk[:, 0], minlength=self.N)
+            jerks[:, 1] += np.bincount(body, weights=jerk[:, 1], minlength=self.N)
+        factor *= mass
+        out[:, 0] += np.bincount(body, weights=factor * displacement[:, 0], minlength=self.N)
+        out[:, 1] += np.bincount(body, weights=factor * displacement[:, 1], minlength=self.N)
+
+    def _accumulate_without_self(self, out, body, level, node, jerks=None):
+        own_mass = self.masses[body]
+        mass = level.mass[node] - own_mass
+        moment = level.com[node] * level.mass[node][:, np.newaxis] \
+            - self.positions[body] * own_mass[:, np.newaxis]
+        if jerks is not None:
+            momentum = level.velocity[node] * level.mass[node][:, np.newaxis] \
+                - self.velocities[body] * own_mass[:, np.newaxis]
+
+        has_mass = mass > 0
+        body, node, mass, moment = body[has_mass], node[has_mass], mass[has_mass], moment[has_mass]
+        displacement = moment / mass[:, np.newaxis] - self.positions[body]
+        dist_squared = np.einsum('ij,ij->i', displacement, displacement)
+        velocity = None if jerks is None else momentum[has_mass] / mass[:, np.newaxis]
+        self._accumulate(
+            out, body, displacement, dist_squared, mass, self._softening(level, body, node), jerks, velocity
+        )
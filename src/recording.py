@@ -0,0 +1,242 @@
+"""
+Binary recording of a run and memory-mapped playback.
+
+File layout, little endian:
+
+    magic       | b"ASTROREC"
+    version     | uint32
+    header_size | uint32, bytes of the JSON header that follows
+    header      | JSON, preset settings and options, body names and asset names
+    bodies      | one BODY_DTYPE row per body
+    padding     | up to a multiple of ALIGNMENT bytes
+    frames      | fixed stride rows of (time, positions, velocities) until the end of the file
+
+A frame is found by its index alone, so playback maps the file and reads any frame
+without touching the rest. A truncated last frame from a killed run is ignored.
+"""
+
+import json
+import numpy as np
+from pathlib import Path
+
+MAGIC = b"ASTROREC"
+VERSION = 1
+ALIGNMENT = 64
+BODY_DTYPE = np.dtype([("mass", "<f8"), ("radius", "<f8"), ("scale", "<f8"), ("color", "u1", (3,))])
+
+
+def frame_dtype(n_bodies: int, dtype="<f8"):
+    """
+    One frame, time stays float64 so long runs keep their clock
+    """
+    return np.dtype([
+        ("time", "<f8"),
+        ("positions", dtype, (n_bodies, 2)),
+        ("velocities", dtype, (n_bodies, 2)),
+    ])
+
+
+def frame_offset(header_size: int, n_bodies: int):
+    end = len(MAGIC) + 8 + header_size + n_bodies * BODY_DTYPE.itemsize
+    return -(-end // ALIGNMENT) * ALIGNMENT
+
+
+class Recorder:
+    """
+    path    | File to write, replaced if it exists, missing folders are created
+    preset  | Preset being run, its store gives the body count and metadata
+    dtype   | np.float64, or np.float32 to halve the file size
+    chunk   | Frames buffered in memory before each write
+
+        with Recorder("runs/solar.rec", preset) as recorder:
+            recorder.record(time, engine.positions, engine.velocities)
+    """
+    def __init__(self, path, preset, dtype=np.float64, chunk=256):
+        store = preset.store
+        dtype = np.dtype(dtype).newbyteorder("<")
+        header = json.dumps({
+            "preset": preset.name,
+            "space_scale": preset.space_scale,
+            "dt": preset.dt,
+            "options": {option: getattr(preset, option) for option in preset.OPTIONS},
+            "dtype": dtype.str,
+            "bodies": len(store),
+            "names": [planet.name for planet in store.planets],
+            "assets": [planet.asset_name for planet in store.planets],
+        }).encode()
+
+        bodies = np.zeros(len(store), dtype=BODY_DTYPE)
+        bodies["mass"] = store.masses
+        bodies["radius"] = store.radii
+        bodies["scale"] = store.scales
+        bodies["color"] = store.colors
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.file.write(np.array([VERSION, len(header)], dtype="<u4").tobytes())
+        self.file.write(header)
+        self.file.write(bodies.tobytes())
+        self.file.write(bytes(frame_offset(len(header), len(store)) - self.file.tell()))
+
+        self.bodies = len(store)
+        self.buffer = np.zeros(chunk, dtype=frame_dtype(len(store), dtype))
+        self.buffered = 0
+        self.frames = 0
+
+    def record(self, time: float, positions: np.ndarray, velocities: np.ndarray, ids=None):
+        """
+        ids gives the original row of each body once collisions have merged some away,
+        the rows of merged bodies are written as NaN
+        """
+        frame = self.buffered
+        self.buffer["time"][frame] = time
+        if ids is None or len(ids) == self.bodies:
+            self.buffer["positions"][frame] = positions
+            self.buffer["velocities"][frame] = velocities
+        else:
+            self.buffer["positions"][frame] = np.nan
+            self.buffer["velocities"][frame] = np.nan
+            self.buffer["positions"][frame, ids] = positions
+            self.buffer["velocities"][frame, ids] = velocities
+        self.buffered += 1
+        self.frames += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.file.flush()
+        self.buffered = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class Playback:
+    """
+    path | Recording written by Recorder
+
+    Frames are a read only memory map, frames[i] costs the same for any i.
+    Has the same request/positions/stop methods as PhysicsThread, so the
+    window can draw a recording in place of a live engine.
+    """
+    def __init__(self, path):
+        path = Path(path)
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a recording")
+            version, header_size = (int(value) for value in np.frombuffer(file.read(8), dtype="<u4"))
+            if version != VERSION:
+                raise ValueError(f"{path} is recording version {version}, expected {VERSION}")
+            self.header = json.loads(file.read(header_size))
+            self.table = np.frombuffer(file.read(self.header["bodies"] * BODY_DTYPE.itemsize), dtype=BODY_DTYPE)
+
+        dtype = frame_dtype(self.header["bodies"], self.header["dtype"])
+        offset = frame_offset(header_size, self.header["bodies"])
+        count = max(path.stat().st_size - offset, 0) // dtype.itemsize
+        if count == 0:
+            raise ValueError(f"{path} has no frames")
+        self.frames = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+        self.times = self.frames["time"]
+        # Set by preset(), the bodies drawn are the rows of store alive in the current frame
+        self.store = None
+        self.alive = None
+        self.bodies = None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame(self, index: int):
+        """
+        (time, positions, velocities) of one frame, the arrays are views into the file
+        """
+        frame = self.frames[index]
+        return float(frame["time"]), frame["positions"], frame["velocities"]
+
+    def index_at(self, time: float):
+        """
+        Last frame at or before time
+        """
+        return int(np.clip(np.searchsorted(self.times, time, side="right") - 1, 0, len(self) - 1))
+
+    def preset(self):
+        """
+        Preset holding the recorded bodies at their first frame
+        """
+        from bodies import BodyStore
+        from planet import Planet
+        from presets import Preset
+        from vector import Vector2D
+
+        _, positions, velocities = self.frame(0)
+        # Named bodies lead, the rest were bulk rows without Planet objects
+        named = len(self.header["names"])
+        objects = [
+            Planet(
+                name=self.header["names"][i],
+                asset=self.header["assets"][i],
+                mass=float(body["mass"]),
+                radius=float(body["radius"]),
+                scale=float(body["scale"]),
+                color=tuple(int(c) for c in body["color"]),
+                position=Vector2D(*positions[i]),
+                velocity=Vector2D(*velocities[i]),
+            )
+            for i, body in enumerate(self.table[:named])
+        ]
+        bulk = self.table[named:]
+        bodies = BodyStore.from_arrays(
+            positions[named:], velocities[named:], bulk["mass"], bulk["radius"], bulk["scale"], bulk["color"]
+        )
+        preset = Preset(
+            self.header["preset"], objects, self.header["space_scale"], self.header["dt"], bodies=bodies,
+            **self.header.get("options", {})
+        )
+        self.store = preset.store
+        return preset
+
+    def request(self, time: float):
+        pass
+
+    def stats(self):
+        return 0.0, 0
+
+    def particles(self):
+        """
+        Recordings hold no test particles
+        """
+        return None
+
+    def positions(self, time: float):
+        """
+        Positions at time, linear between the frames around it, as PhysicsThread.positions.
+        Bodies merged away in the run are NaN in the file and left out of the result.
+        """
+        time = float(min(max(time, self.times[0]), self.times[-1]))
+        index = self.index_at(time)
+        start, positions, _ = self.frame(index)
+        following, alpha = positions, 0.0
+        if index + 1 < len(self):
+            end, following, _ = self.frame(index + 1)
+            alpha = (time - start) / (end - start) if end > start else 1.0
+
+        alive = ~np.isnan(positions[:, 0]) & ~np.isnan(following[:, 0])
+        if self.alive is None or not np.array_equal(alive, self.alive):
+            self.alive = alive
+            self.bodies = self.store.subset(alive)
+
+        positions = positions[alive].astype(np.float64)
+        positions += alpha * (following[alive] - positions)
+        return time, positions, self.bodies
+
+    def stop(self):
+        pass
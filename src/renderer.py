@@ -0,0 +1,161 @@
+"""
+Batched drawing of a whole BodyStore.
+
+Screen positions and the viewport cull are computed for every body at once.
+Bodies smaller than a pixel are written straight into the window's pixel array,
+only bodies big enough to see get a sprite or circle draw call.
+"""
+
+import numpy as np
+import pygame
+import pygame.freetype
+from assets import SpriteCache
+from bodies import BodyStore
+from vector import Vector2D
+
+
+class Renderer:
+    """
+    font       | Font used for the planet labels
+    max_labels | Labels are skipped when more bodies than this are on screen
+    sprites    | Cache of scaled planet sprites
+    """
+    def __init__(self, font: pygame.freetype.Font, max_labels=100, sprites=None):
+        self.font = font
+        self.max_labels = max_labels
+        self.sprites = sprites or SpriteCache()
+        # (text, color) -> (surface, rect), freetype rasterizing is slow
+        self.labels = {}
+        # Store the planet rows were read from, and (name, asset name, sprite) of each row
+        self.planet_store = None
+        self.planet_rows = []
+
+    def label(self, text: str, color: tuple[int, int, int]):
+        key = (text, color)
+        if key not in self.labels:
+            self.labels[key] = self.font.render(text, color)
+        surface, rect = self.labels[key]
+        return surface, rect.copy()
+
+    def planets(self, store: BodyStore):
+        """
+        (name, asset name, sprite) of every planet row of store, read from its Planet objects once
+        per store. Those are views onto the engine's own store, the window never reads their fields.
+        """
+        if store is not self.planet_store:
+            self.planet_store = store
+            self.planet_rows = [(planet.name, planet.asset_name, planet.asset) for planet in store.planets]
+        return self.planet_rows
+
+    @staticmethod
+    def screen_space(positions, radii, space_scale: float, camera_vector: Vector2D, window_size):
+        """
+        Screen centers (N, 2), pixel radii (N,) and the viewport mask of every body
+        """
+        width, height = window_size
+        screen = (positions - camera_vector.Args) * (1 / space_scale)
+        screen[:, 1] = height - screen[:, 1]
+        pixel_radii = radii * (1 / space_scale)
+
+        visible = (screen[:, 0] >= -pixel_radii) & (screen[:, 0] <= width + pixel_radii) \
+            & (screen[:, 1] >= -pixel_radii) & (screen[:, 1] <= height + pixel_radii)
+        return screen, pixel_radii, visible
+
+    def draw(
+        self,
+        window: pygame.Surface,
+        store: BodyStore,
+        positions: np.ndarray,
+        space_scale: float,
+        camera_vector: Vector2D,
+        dirty=None
+    ):
+        """
+        Draw every body of store at positions, returns the viewport mask.
+        Rects touched are appended to dirty when it is a list.
+        """
+        drawn = []
+        screen, pixel_radii, visible = Renderer.screen_space(
+            positions, store.radii * store.scales, space_scale, camera_vector, window.get_size()
+        )
+        # Truncate like int() did for the per planet draw
+        centers = screen.astype(np.int64)
+
+        points = visible & (pixel_radii < 1.0)
+        drawn.append(self.draw_points(window, centers[points], store.colors[points]))
+
+        planets = self.planets(store)
+        large = np.flatnonzero(visible & ~points)
+        for i in large:
+            center = (int(centers[i, 0]), int(centers[i, 1]))
+            _, asset_name, asset = planets[i] if i < len(planets) else (None, None, None)
+            if asset:
+                image_size = int(2 * pixel_radii[i])
+                scaled_image = self.sprites.get(asset_name, asset, image_size)
+                drawn.append(window.blit(scaled_image, scaled_image.get_rect(center=center)))
+            else:
+                drawn.append(pygame.draw.circle(window, store.colors[i], center, int(pixel_radii[i])))
+
+        labelled = np.flatnonzero(visible[:len(planets)])
+        if len(labelled) <= self.max_labels:
+            for i in labelled:
+                color = tuple(int(c) for c in store.colors[i])
+                label_surface, label_rect = self.label(planets[i][0], color)
+                label_rect.center = (screen[i, 0], screen[i, 1] + pixel_radii[i] + 10)
+                drawn.append(window.blit(label_surface, label_rect))
+
+        if dirty is not None:
+            dirty.extend(rect for rect in drawn if rect)
+        return visible
+
+    def draw_particles(
+        self,
+        window: pygame.Surface,
+        positions: np.ndarray,
+        colors: np.ndarray,
+        space_scale: float,
+        camera_vector: Vector2D,
+        dirty=None
+    ):
+        """
+        One pixel per test particle, no sprites, labels or trails
+        """
+        screen = (positions - camera_vector.Args) * (1 / space_scale)
+        screen[:, 1] = window.get_height() - screen[:, 1]
+        # Far off screen particles would overflow the integer cast, draw_points drops them anyway
+        np.clip(screen, -1.0, max(window.get_size()), out=screen)
+        rect = self.draw_points(window, screen.astype(np.int64), colors)
+        if dirty is not None and rect:
+            dirty.append(rect)
+
+    @staticmethod
+    def draw_points(window: pygame.Surface, centers: np.ndarray, colors: np.ndarray):
+        """
+        One pixel per center, returns the bounding rect of the pixels written or None
+        """
+        width, height = window.get_size()
+        inside = (centers[:, 0] >= 0) & (centers[:, 0] < width) & (centers[:, 1] >= 0) & (centers[:, 1] < height)
+        centers, colors = centers[inside], colors[inside]
+        if len(centers) == 0:
+            return None
+
+        low = centers.min(axis=0)
+        high = centers.max(axis=0)
+        bounds = pygame.Rect(int(low[0]), int(low[1]), int(high[0] - low[0]) + 1, int(high[1] - low[1]) + 1)
+
+        if window.get_bytesize() != 4:
+            for (x, y), color in zip(centers.tolist(), colors.tolist()):
+                window.set_at((x, y), color)
+            return bounds
+
+        red, green, blue, _ = window.get_shifts()
+        packed = (colors[:, 0].astype(np.uint32) << red) \
+            | (colors[:, 1].astype(np.uint32) << green) \
+            | (colors[:, 2].astype(np.uint32) << blue) \
+            | np.uint32(window.get_masks()[3])
+
+        # The pixel view locks the surface until it is released
+        pixels = pygame.surfarray.pixels2d(window)
+        pixels[centers[:, 0], centers[:, 1]] = packed
+        del pixels
+        return bounds
@@ -0,0 +1,130 @@
+"""
+Softened gravity, the 1 / r^3 in a = G * m * (r_j - r_i) / r^3 replaced by a kernel
+that stays finite as two bodies meet.
+
+    plummer | 1 / (r^2 + eps^2)^1.5, every pair is weakened a little however far apart
+    spline  | Cubic spline of Monaghan & Lattanzio (1985) as in GADGET-2, support h = 2.8 * eps,
+            | exactly Newtonian past h and as deep at r = 0 as a Plummer potential of eps
+
+Softening is for collisionless runs such as star clusters, where the bodies stand for a smooth
+distribution and close encounters are noise. It caps the accelerations, so larger steps stay stable.
+A pair is softened by the larger eps of its two bodies, forces stay equal and opposite.
+softening arguments are None for plain Newtonian gravity, one eps for every pair, or an array of
+pair eps matching the distances.
+"""
+
+import numpy as np
+
+KERNELS = ("plummer", "spline")
+# Spline support in units of the Plummer eps with the same central potential
+SPLINE_SUPPORT = 2.8
+
+
+def check_kernel(kernel: str):
+    if kernel not in KERNELS:
+        raise ValueError(f"Unknown softening kernel '{kernel}', expected one of {KERNELS}")
+
+
+def body_softenings(softenings: np.ndarray, default: float):
+    """
+    eps of every body, its own where set and default elsewhere.
+    None when nothing is softened and a float when every body shares one eps, so the
+    common cases skip the per pair arrays.
+    """
+    eps = np.where(softenings > 0, softenings, default)
+    if len(eps) == 0 or not eps.any():
+        return None
+    if (eps == eps[0]).all():
+        return float(eps[0])
+    return eps
+
+
+def pair_softening(softenings, rows, columns=slice(None)):
+    """
+    eps of every (row, column) pair of bodies from body_softenings, the larger of the two
+    """
+    if softenings is None or np.ndim(softenings) == 0:
+        return softenings
+    return np.maximum(softenings[rows, np.newaxis], softenings[np.newaxis, columns])
+
+
+def inverse_cube(dist_squared, softening, kernel, out):
+    """
+    Softened 1 / r^3 of every entry of dist_squared into out.
+    Entries of 0 or inf (a body with itself) are not written.
+    "plummer" overwrites dist_squared with the softened r^2.
+    """
+    valid = (dist_squared > 0) & (dist_squared != np.inf)
+    if softening is None or kernel == "plummer":
+        if softening is not None:
+            dist_squared += np.square(softening)
+        np.power(dist_squared, -1.5, out=out, where=valid)
+        return out
+
+    force, _ = _spline(np.sqrt(dist_squared), SPLINE_SUPPORT * np.asarray(softening, dtype=np.float64))
+    np.copyto(out, force, where=valid)
+    return out
+
+
+def inverse_cube_and_slope(dist_squared, softening, kernel):
+    """
+    (f, g) with f the softened 1 / r^3 and g = (df/dr) / r, for the jerk
+        j = G * m * (f * v + g * (r . v) * r)
+    Both are 0 where dist_squared is 0 or inf.
+    """
+    valid = (dist_squared > 0) & (dist_squared != np.inf)
+    force = np.zeros_like(dist_squared)
+    slope = np.zeros_like(dist_squared)
+    if softening is None or kernel == "plummer":
+        softened = dist_squared + np.square(softening) if softening is not None else dist_squared
+        np.power(softened, -1.5, out=force, where=valid)
+        np.divide(-3.0 * force, softened, out=slope, where=valid)
+        return force, slope
+
+    spline_force, spline_slope = _spline(np.sqrt(dist_squared), SPLINE_SUPPORT * np.asarray(softening, dtype=np.float64))
+    np.copyto(force, spline_force, where=valid)
+    np.copyto(slope, spline_slope, where=valid)
+    return force, slope
+
+
+def inverse_distance(dist, softening, kernel, out, where):
+    """
+    Softened 1 / r of the entries of dist selected by the mask where, for the potential energy
+    """
+    if softening is None:
+        return np.divide(1.0, dist, out=out, where=where & (dist > 0))
+    if kernel == "plummer":
+        return np.power(dist * dist + np.square(softening), -0.5, out=out, where=where)
+
+    h = np.broadcast_to(SPLINE_SUPPORT * np.asarray(softening, dtype=np.float64), dist.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        u = dist / h
+        inner = 2.8 + u * u * (-16 / 3 + u * u * (9.6 - 6.4 * u))
+        outer = 3.2 - 1 / (15 * u) + u * u * (-32 / 3 + u * (16.0 - u * (9.6 - 32 / 15 * u)))
+        values = np.where(u < 1, np.where(u < 0.5, inner, outer) / h, 1 / dist)
+    np.copyto(out, values, where=where & ((dist > 0) | (h > 0)))
+    return out
+
+
+def _spline(r, h):
+    """
+    Spline kernel force f = 1 / r^3 and slope (df/dr) / r, Newtonian where r >= h
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        u = r / h
+        h3 = 1 / (h * h * h)
+        h5 = h3 / (h * h)
+        force = np.where(
+            u < 0.5,
+            h3 * (32 / 3 + u * u * (32.0 * u - 38.4)),
+            h3 * (64 / 3 - 48.0 * u + 38.4 * u * u - 32 / 3 * u * u * u - 1 / (15 * u * u * u))
+        )
+        slope = np.where(
+            u < 0.5,
+            h5 * (96.0 * u - 76.8),
+            h5 * (-48.0 / u + 76.8 - 32.0 * u + 0.2 / u**5)
+        )
+        newton = u >= 1
+        force = np.where(newton, 1 / (r * r * r), force)
+        slope = np.where(newton, -3 / r**5, slope)
+    return force, slope
@@ -0,0 +1,196 @@
+"""
+Ways of covering a frame interval with integration steps.
+
+"fixed" takes whole steps of engine.dt and carries the remainder to the next call.
+"adaptive" picks one global step from the fastest body, up to engine.dt.
+"hierarchical" gives every body its own power of two fraction of engine.dt (block timesteps),
+so slow outer bodies are not integrated at the rate of the fastest orbit.
+"""
+
+import numpy as np
+
+
+class Timestep:
+    name = ""
+
+    def __init__(self, tolerance=0.02, max_level=10):
+        self.tolerance = tolerance
+        self.max_level = max_level
+
+    def reset(self):
+        """
+        Forget anything cached between calls, the engine state was changed from outside
+        """
+
+    def drop_forces(self):
+        """
+        Forget cached accelerations but keep the time owed, bodies were merged away
+        """
+
+    def advance(self, engine, interval: float):
+        raise NotImplementedError
+
+    def body_timesteps(self, engine, targets):
+        """
+        Aarseth style step for each body in targets: tolerance * |a| / |da/dt|
+        """
+        return self.timesteps(*engine.acceleration_and_jerk(targets))
+
+    def timesteps(self, accelerations, jerks):
+        accel = np.linalg.norm(accelerations, axis=1)
+        jerk = np.linalg.norm(jerks, axis=1)
+
+        steps = np.full(len(accelerations), np.inf)
+        np.divide(self.tolerance * accel, jerk, out=steps, where=jerk > 0)
+        return steps
+
+
+class FixedTimestep(Timestep):
+    name = "fixed"
+
+    def __init__(self, tolerance=0.02, max_level=10):
+        super().__init__(tolerance, max_level)
+        self.pending = 0.0
+
+    def reset(self):
+        self.pending = 0.0
+
+    def whole_steps(self, engine, interval: float):
+        self.pending += interval
+        # Tolerate round off so an interval of exactly k * dt gives k steps
+        steps = int(self.pending / engine.dt + 1e-9)
+        self.pending -= steps * engine.dt
+        return steps
+
+    def advance(self, engine, interval: float):
+        steps = self.whole_steps(engine, interval)
+        engine.step_n(steps, engine.dt)
+        return steps * engine.dt
+
+
+class AdaptiveTimestep(Timestep):
+    name = "adaptive"
+
+    def advance(self, engine, interval: float):
+        min_dt = engine.dt / (1 << self.max_level)
+        remaining = interval
+        while remaining > 1e-9 * interval:
+            # Bodies may merge during a step, so everyone is counted again each time.
+            # A lone body or particles around it have no jerk to go by and take steps of engine.dt.
+            dt = engine.dt
+            if engine.N >= 2:
+                dt = np.clip(self.body_timesteps(engine, np.arange(engine.N)).min(), min_dt, engine.dt)
+            dt = min(dt, remaining)
+            engine.step_n(1, dt)
+            remaining -= dt
+        return interval
+
+
+class HierarchicalTimestep(FixedTimestep):
+    """
+    Block timesteps with the fourth order Hermite scheme of Makino & Aarseth (1992),
+    the engine's integrator is not used.
+
+    Body i steps by engine.dt / 2**level[i]. Time inside a block is counted in integer units
+    of engine.dt / 2**max_level, a body is synchronised whenever the unit count is a multiple
+    of its stride. On every tick each body is predicted from the start of its own step with
+    its acceleration and jerk, and only the bodies finishing a step get a new acceleration and
+    jerk and are corrected, so a force evaluation costs O(N_active * N). The tolerance is the
+    Aarseth eta the scheme was tuned for, and the jerk it needs is the one that sets the levels.
+    """
+    name = "hierarchical"
+
+    def __init__(self, tolerance=0.02, max_level=10):
+        super().__init__(tolerance, max_level)
+        self.has_accelerations = False
+        self.jerks = None
+        self.levels = None
+
+    def reset(self):
+        super().reset()
+        self.drop_forces()
+
+    def drop_forces(self):
+        self.has_accelerations = False
+
+    def advance(self, engine, interval: float):
+        blocks = self.whole_steps(engine, interval)
+        for _ in range(blocks):
+            if engine.particles is not None:
+                engine.particles.begin(engine, engine.dt)
+            self.block(engine)
+            if engine.particles is not None:
+                engine.particles.end(engine, engine.dt)
+            engine.collide()
+        return blocks * engine.dt
+
+    def desired_levels(self, engine, accelerations, jerks):
+        steps = self.timesteps(accelerations, jerks)
+        with np.errstate(divide="ignore"):
+            levels = np.ceil(np.log2(engine.dt / steps))
+        return np.clip(levels, 0, self.max_level).astype(np.int64)
+
+    def block(self, engine):
+        if engine.N == 0:
+            return
+
+        if not self.has_accelerations:
+            engine.accelerations[:], self.jerks = engine.acceleration_and_jerk(np.arange(engine.N))
+            self.has_accelerations = True
+
+        unit = engine.dt / (1 << self.max_level)
+        block_units = 1 << self.max_level
+        self.levels = self.desired_levels(engine, engine.accelerations, self.jerks)
+
+        # Every body's state where its current step started, engine arrays hold the predictions
+        start_positions = engine.positions.copy()
+        start_velocities = engine.velocities.copy()
+        start_accelerations = engine.accelerations.copy()
+        start_jerks = self.jerks
+        start_units = np.zeros(engine.N, dtype=np.int64)
+
+        t = 0
+        while t < block_units:
+            strides = 1 << (self.max_level - self.levels)
+            tick = 1 << (self.max_level - int(self.levels.max()))
+            engine.steps += 1
+            t += tick
+
+            tau = ((t - start_units) * unit)[:, np.newaxis]
+            engine.velocities[:] = start_velocities + tau * (start_accelerations + 0.5 * tau * start_jerks)
+            engine.positions[:] = start_positions + tau * (
+                start_velocities + tau * (0.5 * start_accelerations + tau / 6 * start_jerks)
+            )
+
+            # Bodies ending a step now are corrected with the forces at the predicted positions
+            ending = np.flatnonzero(t % strides == 0)
+            accelerations, jerks = engine.acceleration_and_jerk(ending)
+            step = (unit * strides[ending])[:, np.newaxis]
+            velocities = start_velocities[ending] + 0.5 * step * (start_accelerations[ending] + accelerations) \
+                + step**2 / 12 * (start_jerks[ending] - jerks)
+            positions = start_positions[ending] + 0.5 * step * (start_velocities[ending] + velocities) \
+                + step**2 / 12 * (start_accelerations[ending] - accelerations)
+
+            engine.positions[ending] = start_positions[ending] = positions
+            engine.velocities[ending] = start_velocities[ending] = velocities
+            engine.accelerations[ending] = start_accelerations[ending] = accelerations
+            start_jerks[ending] = jerks
+            start_units[ending] = t
+
+            if t < block_units:
+                # A body may only move to a level whose steps line up with the current time
+                trailing_zeros = (t & -t).bit_length() - 1
+                aligned = self.max_level - trailing_zeros
+                self.levels[ending] = np.maximum(self.desired_levels(engine, accelerations, jerks), aligned)
+
+
+TIMESTEPS = {
+    timestep.name: timestep
+    for timestep in (FixedTimestep, AdaptiveTimestep, HierarchicalTimestep)
+}
+
+
+def get_timestep(name: str, tolerance=0.02, max_level=10):
+    if name not in TIMESTEPS:
+        raise ValueError(f"Unknown timestep mode '{name}', expected one of {tuple(TIMESTEPS)}")
+    return TIMESTEPS[name](tolerance, max_level)
@@ -0,0 +1,97 @@
+"""
+Orbit trails in one preallocated ring buffer.
+
+Only a few bodies get a trail, the named planets first and then the heaviest of the rest,
+so a 50k body preset keeps the same handful of polylines as the Solar System.
+"""
+
+import numpy as np
+from vector import Vector2D
+
+
+class TrailBuffer:
+    """
+    rows        | Rows of the BodyStore that get a trail, sorted, the others are never stored or drawn
+    ids         | BodyStore ids of those rows, to follow them when the rows change
+    max_points  | Positions kept per trail, the oldest is overwritten first
+    draw_points | Most points drawn per trail, longer trails are decimated
+    """
+    def __init__(self, rows: np.ndarray, ids: np.ndarray, max_points=500, draw_points=100):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.ids = np.asarray(ids)
+        self.max_points = max_points
+        self.draw_points = draw_points
+        self.points = np.zeros((len(self.rows), max_points, 2))
+        self.lengths = np.zeros(len(self.rows), dtype=np.int64)
+        # Next slot to write, shared by every trail
+        self.head = 0
+
+    @classmethod
+    def for_store(cls, store, max_trails=100, max_points=500, draw_points=100):
+        """
+        Trails for the named planets and then the heaviest other bodies, max_trails in all
+        """
+        named = len(store.planets)
+        by_mass = np.argsort(-store.masses, kind="stable")
+        # Named planets sort ahead of every bulk body, heavier first within each group
+        order = by_mass[np.argsort(by_mass >= named, kind="stable")]
+        rows = np.sort(order[:max_trails])
+        return cls(rows, store.ids[rows], max_points, draw_points)
+
+    def push(self, positions: np.ndarray):
+        self.points[:, self.head] = positions[self.rows]
+        self.head = (self.head + 1) % self.max_points
+        np.minimum(self.lengths + 1, self.max_points, out=self.lengths)
+
+    def clear(self, hidden=None):
+        """
+        Restart every trail, or those of the bodies set in the boolean mask hidden over the store's rows
+        """
+        if hidden is None:
+            self.lengths[:] = 0
+        else:
+            self.lengths[hidden[self.rows]] = 0
+
+    def follow(self, ids: np.ndarray):
+        """
+        The store's rows now hold the sorted ids, trails of bodies merged away are dropped
+        """
+        rows = np.searchsorted(ids, self.ids)
+        found = rows < len(ids)
+        found[found] = ids[rows[found]] == self.ids[found]
+        if not found.all():
+            self.points, self.lengths, self.ids = self.points[found], self.lengths[found], self.ids[found]
+        self.rows = rows[found]
+
+    def screen_points(self, camera_vector: Vector2D, space_scale: float, window_height: int, trails=slice(None)):
+        """
+        Trails in screen space, oldest point first, as one (len(trails), max_points, 2) array
+        """
+        chronological = (self.head + np.arange(self.max_points)) % self.max_points
+        points = self.points[trails][:, chronological]
+        points -= camera_vector.Args
+        points *= 1 / space_scale
+        points[:, :, 1] = window_height - points[:, :, 1]
+        return points
+
+    def draw(self, window, colors: np.ndarray, space_scale: float, camera_vector: Vector2D, dirty=None):
+        """
+        Draw every trail with at least two points, colors are those of every row of the store.
+        Touched rects are appended to dirty.
+        """
+        import pygame
+
+        drawn = np.flatnonzero(self.lengths > 1)
+        if len(drawn) == 0:
+            return
+
+        points = self.screen_points(camera_vector, space_scale, window.get_height(), drawn)
+        for trail, i in zip(points, drawn):
+            # Every stride-th point counting back from the newest, so the trail still meets its body
+            stride = -(-int(self.lengths[i]) // self.draw_points)
+            trail = trail[self.max_points - 1 - np.arange(0, self.lengths[i], stride)[::-1]]
+            if len(trail) < 2:
+                continue
+            rect = pygame.draw.lines(window, colors[self.rows[i]], False, trail.tolist(), 1)
+            if dirty is not None:
+                dirty.append(rect)
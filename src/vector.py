@@ -1,49 +1,75 @@
 """
 Vector2D class optimized for calculation efficiency
+
+Two plain floats in __slots__, a numpy array per 2 element vector costs far more
+in allocation than the math itself. Bulk math belongs in the BodyStore arrays.
 """
 
+import math
 import numpy as np
 
 class Vector2D:
+    __slots__ = ("x", "y")
+
     def __init__(self, x=0.0, y=0.0):
-        self.vector = np.array([x, y], dtype=np.float64)
+        self.x = float(x)
+        self.y = float(y)
 
     def copy(self):
-        return Vector2D(*self.vector.copy())
-
-    @property
-    def x(self):
-        return self.vector[0]
+        return Vector2D(self.x, self.y)
 
     @property
-    def y(self):
-        return self.vector[1]
+    def vector(self):
+        """
+        Copy as a numpy array, writing to it does not change the vector
+        """
+        return np.array([self.x, self.y], dtype=np.float64)
 
     @property
     def Args(self):
-        return tuple(self.vector)
+        return (self.x, self.y)
 
     @property
     def magnitude(self):
-        return np.linalg.norm(self.vector)
+        return math.hypot(self.x, self.y)
 
     def dot(self, other):
-        return np.dot(self.vector, other.vector)
+        return self.x * other.x + self.y * other.y
 
     def __add__(self, other):
-        return Vector2D(*(self.vector + other.vector))
+        return Vector2D(self.x + other.x, self.y + other.y)
 
     def __sub__(self, other):
-        return Vector2D(*(self.vector - other.vector))
+        return Vector2D(self.x - other.x, self.y - other.y)
 
     def __mul__(self, scalar):
-        return Vector2D(*(self.vector * scalar))
+        return Vector2D(self.x * scalar, self.y * scalar)
 
     def __rmul__(self, scalar):
         return self.__mul__(scalar)
 
     def __truediv__(self, scalar):
-        return Vector2D(*(self.vector / scalar))
+        return Vector2D(self.x / scalar, self.y / scalar)
+
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __imul__(self, scalar):
+        self.x *= scalar
+        self.y *= scalar
+        return self
+
+    def __itruediv__(self, scalar):
+        self.x /= scalar
+        self.y /= scalar
+        return self
 
     def __str__(self):
-        return f"(x={self.vector[0]}, y={self.vector[1]})"
+        return f"(x={self.x}, y={self.y})"